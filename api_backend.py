@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+import fnmatch
+import re
+from urllib.parse import quote
+
+import semver
+
+import constants
+import gitlab_scheduler
+
+
+get_headers = gitlab_scheduler.get_headers
+
+
+def get_all_pages(endpoint, params=None, priority=constants.PRIORITY_TAGGING):
+
+    """
+
+    The function gets all the pages of a paginated gitlab api, following the X-Next-Page header
+
+    :param endpoint: api endpoint
+    :param params: query parameters of the api
+    :param priority: priority of the requests
+    :return: items of all the pages
+    :rtype: list
+
+    """
+
+    items = []
+    params = dict(params or {}, per_page=constants.API_PER_PAGE)
+    page = '1'
+    while page:
+        response = gitlab_scheduler.get(endpoint, priority=priority, headers=get_headers(), params=dict(params, page=page))
+        response.raise_for_status()
+        items.extend(response.json())
+        page = response.headers.get('X-Next-Page')
+    return items
+
+
+def get_tags(project_id, pattern=None, priority=constants.PRIORITY_TAGGING):
+
+    """
+
+    The function gets the repository tags matching a glob pattern through gitlab's tags api
+
+    :param project_id: gitlab project id
+    :param pattern: glob pattern of the tag names (e.g. 'v[0-9]*'), all the tags if None
+    :param priority: priority of the requests
+    :return: tags matching the pattern
+    :rtype: list
+
+    """
+
+    params = {}
+    if pattern:
+        # narrow down the listing server side with the literal prefix of the pattern, the pattern itself is applied below
+        prefix = re.split(r"[*?\[]", pattern, 1)[0]
+        if prefix:
+            params['search'] = f"^{prefix}"
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/tags"
+    print(f"Getting the repository tags, endpoint is: {endpoint}")
+    tags = get_all_pages(endpoint, params, priority)
+    return [tag for tag in tags if pattern is None or fnmatch.fnmatchcase(tag['name'], pattern)]
+
+
+def get_tag(project_id, tag_name):
+
+    """
+
+    The function gets a single repository tag through gitlab's tags api, bypassing the request cache as the tag may just have been created
+
+    :param project_id: gitlab project id
+    :param tag_name: name of the tag
+    :return: tag as returned by the tags api or None if the tag doesn't exist
+    :rtype: dict or None
+
+    """
+
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/tags/{quote(tag_name, safe='')}"
+    response = gitlab_scheduler.get(endpoint, priority=constants.PRIORITY_TAGGING, headers=get_headers())
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+def get_merged_merge_requests(project_id, priority=constants.PRIORITY_TAGGING):
+
+    """
+
+    The function gets all the merged merge requests of a project through gitlab's merge requests api, most recently created first
+
+    :param project_id: gitlab project id
+    :param priority: priority of the requests
+    :return: merged merge requests, each with its merge_commit_sha and squash_commit_sha
+    :rtype: list
+
+    """
+
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/merge_requests"
+    return get_all_pages(endpoint, {'state': 'merged'}, priority)
+
+
+def get_commit(project_id, commit_sha):
+
+    """
+
+    The function gets a commit through gitlab's commits api, e.g. to expand an abbreviated commit SHA
+
+    :param project_id: gitlab project id
+    :param commit_sha: full or abbreviated commit SHA
+    :return: commit as returned by the commits api
+    :rtype: dict
+
+    """
+
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/commits/{commit_sha}"
+    return gitlab_scheduler.get_json(endpoint, priority=constants.PRIORITY_TAGGING, headers=get_headers())
+
+
+def is_ancestor(project_id, ancestor_sha, descendant_sha):
+
+    """
+
+    The function checks through gitlab's merge base api if a commit is reachable from another one
+
+    :param project_id: gitlab project id
+    :param ancestor_sha: commit which may be an ancestor
+    :param descendant_sha: commit which may be a descendant
+    :return: True if ancestor_sha is reachable from descendant_sha
+    :rtype: bool
+
+    """
+
+    if ancestor_sha == descendant_sha:
+        return True
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/merge_base"
+    response = gitlab_scheduler.get(endpoint, priority=constants.PRIORITY_TAGGING, headers=get_headers(), params=[('refs[]', ancestor_sha), ('refs[]', descendant_sha)])
+    response.raise_for_status()
+    return response.json()['id'] == ancestor_sha
+
+
+def get_last_tag(project_id, head_sha):
+
+    """
+
+    The function returns the highest semver tag with the specified prefix which is reachable from a commit, the api counterpart of 'git describe --tags --match'
+
+    :param project_id: gitlab project id
+    :param head_sha: commit from which the tag must be reachable
+    :return: tag as returned by the tags api or None if no tag is found
+    :rtype: dict or None
+
+    """
+
+    tags = get_tags(project_id, f"{constants.PREFIX}[0-9]*")
+    semver_tags = []
+    for tag in tags:
+        version = tag['name'][len(constants.PREFIX):]
+        if semver.VersionInfo.isvalid(version):
+            semver_tags.append((semver.VersionInfo.parse(version), tag))
+    semver_tags.sort(key=lambda semver_tag: semver_tag[0], reverse=True)
+
+    for version, tag in semver_tags:
+        if is_ancestor(project_id, tag['commit']['id'], head_sha):
+            print(f"most recent tag reachable from the commit {head_sha} is: {tag['name']}")
+            return tag
+    print('No tags found, hence defaulting to version 0.0.0')
+
+
+def get_commits_since_last_tag(project_id, last_tag, head_sha):
+
+    """
+
+    The function gets the first-parent commits since the last tag through gitlab's compare api, the api counterpart of 'git log --first-parent tag..HEAD'
+
+    The compare api returns every commit of the range, hence the first-parent chain is followed from head_sha through the parent ids
+
+    :param project_id: gitlab project id
+    :param last_tag: last tag as returned by get_last_tag
+    :param head_sha: commit up to which the commits are compared
+    :return: commit SHAs since the last tag, newest first, one per line
+    :rtype: str
+
+    """
+
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/compare"
+    print(f"Getting the commits between {last_tag['name']} and {head_sha}, endpoint is: {endpoint}")
+    response = gitlab_scheduler.get(endpoint, priority=constants.PRIORITY_TAGGING, headers=get_headers(), params={'from': last_tag['commit']['id'], 'to': head_sha, 'straight': 'false'})
+    response.raise_for_status()
+    commits = {commit['id']: commit for commit in response.json()['commits']}
+
+    first_parent_commits = []
+    commit_sha = head_sha
+    while commit_sha in commits:
+        first_parent_commits.append(commit_sha)
+        parent_ids = commits[commit_sha]['parent_ids']
+        commit_sha = parent_ids[0] if parent_ids else None
+    commits_since_last_tag = '\n'.join(first_parent_commits)
+    print(f"commits_since_last_tag: {commits_since_last_tag}")
+    return commits_since_last_tag
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import constants
+
+
+class ApiStandIn():
+
+    """
+
+    Local stand-in of the few gitlab api endpoints used by the tagging script, backed by a local git repository,
+    so that concurrent tagging runs can be exercised without a gitlab instance, e.g.:
+        python api_stand_in.py --repo /path/to/repo --merge-requests merge_requests.json &
+        CI_API_V4_URL=http://localhost:8081 CI_PROJECT_ID=1 SEMVER_BACKEND=api CI_COMMIT_SHA=<sha> python test.py
+
+    The merge requests of the commits are read from a json file mapping commit SHAs to their merge requests
+
+    """
+
+    def __init__(self, repo, merge_requests=None):
+        self.repo = os.path.abspath(repo)
+        self.merge_requests = merge_requests or {}
+        self.tags_lock = threading.Lock()
+
+    def git(self, *args):
+        return subprocess.check_output(["git", "-C", self.repo] + list(args), stderr=subprocess.DEVNULL).decode().strip()
+
+    def get_commit(self, ref):
+        commit_sha, *parent_ids = self.git("rev-list", "--parents", "-n", "1", f"{ref}^{{commit}}").split()
+        created_at = datetime.fromtimestamp(int(self.git("show", "-s", "--format=%ct", commit_sha)), timezone.utc).isoformat()
+        return {'id': commit_sha, 'parent_ids': parent_ids, 'created_at': created_at}
+
+    def get_tag(self, tag_name):
+        try:
+            commit = self.get_commit(f"refs/tags/{tag_name}")
+        except subprocess.CalledProcessError:
+            return None
+        return {'name': tag_name, 'commit': commit, 'created_at': None}
+
+    def get_tags(self, search=None):
+        tag_names = self.git("for-each-ref", "--format", "%(refname:short)", "refs/tags/").splitlines()
+        if search and search.startswith('^'):
+            tag_names = [tag_name for tag_name in tag_names if tag_name.startswith(search[1:])]
+        return [self.get_tag(tag_name) for tag_name in tag_names]
+
+    def create_tag(self, tag_name, ref, message):
+        # tags are created one at a time, like gitlab does, so that a concurrent creation of the same tag is reported as a conflict
+        with self.tags_lock:
+            if self.get_tag(tag_name):
+                return 400, {'message': f"Tag {tag_name} already exists"}
+            self.git("tag", "-a", tag_name, ref, "-m", message or tag_name)
+            return 201, self.get_tag(tag_name)
+
+    def get_commit_merge_requests(self, ref):
+        commit_sha = self.get_commit(ref)['id']
+        return self.merge_requests.get(commit_sha, [])
+
+    def get_merged_merge_requests(self):
+        # the json file has no merge_commit_sha, the commit the merge requests are listed under stands in for it
+        merged_merge_requests = {}
+        for commit_sha, merge_requests in self.merge_requests.items():
+            for merge_request in merge_requests:
+                merged_merge_requests.setdefault(merge_request['iid'], dict(merge_request, merge_commit_sha=merge_request.get('merge_commit_sha', commit_sha)))
+        return sorted(merged_merge_requests.values(), key=lambda merge_request: merge_request['iid'], reverse=True)
+
+    def get_merge_base(self, refs):
+        return self.get_commit(self.git("merge-base", *refs))
+
+    def compare(self, from_ref, to_ref):
+        commit_shas = self.git("rev-list", "--reverse", f"{from_ref}..{to_ref}").splitlines()
+        return {'commits': [self.get_commit(commit_sha) for commit_sha in commit_shas]}
+
+    def handle(self, method, path, params):
+
+        """
+
+        The function routes an api request to the local repository
+
+        :param method: http method
+        :param path: path of the request below the api base, e.g. /projects/1/repository/tags
+        :param params: query string and form parameters
+        :return: http status and json body
+        :rtype: tuple
+
+        """
+
+        if method == 'GET' and re.match(r"^/projects/[^/]+$", path):
+            return 200, {'id': path.rsplit('/', 1)[1], 'http_url_to_repo': self.repo}
+        if method == 'GET' and re.match(r"^/projects/[^/]+/merge_requests$", path) and params.get('state') == ['merged']:
+            return 200, self.get_merged_merge_requests()
+        route = re.match(r"^/projects/[^/]+/repository/(.+)$", path)
+        if not route:
+            return 404, {'message': '404 Not Found'}
+        route = route.group(1)
+        try:
+            if method == 'POST' and route == 'tags':
+                return self.create_tag(params['tag_name'][0], params['ref'][0], params.get('message', [''])[0])
+            if method == 'GET' and route == 'tags':
+                return 200, self.get_tags(params.get('search', [None])[0])
+            if method == 'GET' and route.startswith('tags/'):
+                tag = self.get_tag(unquote(route[len('tags/'):]))
+                return (200, tag) if tag else (404, {'message': '404 Tag Not Found'})
+            if method == 'GET' and route == 'merge_base':
+                return 200, self.get_merge_base(params['refs[]'])
+            if method == 'GET' and route == 'compare':
+                return 200, self.compare(params['from'][0], params['to'][0])
+            commit_route = re.match(r"^commits/([^/]+)(/merge_requests)?$", route)
+            if method == 'GET' and commit_route:
+                if commit_route.group(2):
+                    return 200, self.get_commit_merge_requests(commit_route.group(1))
+                return 200, self.get_commit(commit_route.group(1))
+        except subprocess.CalledProcessError:
+            return 404, {'message': '404 Commit Not Found'}
+        except KeyError as key:
+            return 400, {'message': f"{key} is missing"}
+        return 404, {'message': '404 Not Found'}
+
+
+class ApiStandInHandler(BaseHTTPRequestHandler):
+
+    stand_in = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.respond(*self.stand_in.handle('GET', url.path, parse_qs(url.query)))
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        params.update(parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()))
+        self.respond(*self.stand_in.handle('POST', url.path, params))
+
+    def respond(self, status, body):
+        body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Serve a local stand-in of the gitlab api used by the tagging script')
+    parser.add_argument('--repo', default='.', help='git repository backing the api')
+    parser.add_argument('--merge-requests', default=None, help='json file mapping commit SHAs to their merge requests')
+    parser.add_argument('--port', type=int, default=constants.API_STAND_IN_PORT)
+    args = parser.parse_args()
+
+    merge_requests = {}
+    if args.merge_requests:
+        with open(args.merge_requests) as fp:
+            merge_requests = json.load(fp)
+
+    ApiStandInHandler.stand_in = ApiStandIn(args.repo, merge_requests)
+    server = ThreadingHTTPServer(('', args.port), ApiStandInHandler)
+    print(f"Serving the gitlab api stand-in of {ApiStandInHandler.stand_in.repo} on port {args.port}, use CI_API_V4_URL=http://localhost:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
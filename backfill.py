@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import api_backend
+import bump_ledger
+import constants
+import test as semver_tag
+
+
+def get_first_parent_history(from_tag=None):
+
+    """
+
+    The function walks the first-parent history once, from the root (or the given tag) up to HEAD
+
+    :param from_tag: tag from which the history is walked, the root commit if None
+    :return: full SHA, subject and whether it is a merge commit of every first-parent commit, oldest first
+    :rtype: list
+
+    """
+
+    revision_range = f"{from_tag}..HEAD" if from_tag else "HEAD"
+    history = semver_tag.git("log", "--first-parent", "--reverse", "--pretty=%H %P%x09%s", revision_range).decode().strip()
+    first_parent_commits = []
+    for line in history.splitlines():
+        shas, _, subject = line.partition('\t')
+        commit_sha, *parent_shas = shas.split()
+        first_parent_commits.append((commit_sha, subject, len(parent_shas) > 1))
+    merge_commits_count = sum(is_merge_commit for _, _, is_merge_commit in first_parent_commits)
+    print(f"{merge_commits_count} merge commits found in the first-parent history of {revision_range}")
+    return first_parent_commits
+
+
+def get_existing_tags():
+
+    """
+
+    The function maps the commits to the semver tags (with the specified prefix) already pointing to them
+
+    :return: commit SHA to tag name
+    :rtype: dict
+
+    """
+
+    tags = semver_tag.git("for-each-ref", "--format=%(refname:strip=2) %(objectname) %(*objectname)", f"refs/tags/{constants.PREFIX}[0-9]*").decode().strip()
+    existing_tags = {}
+    for line in tags.splitlines():
+        tag_name, object_sha, *peeled_sha = line.split()
+        # annotated tags point to a tag object, hence the commit is the peeled object
+        commit_sha = peeled_sha[0] if peeled_sha else object_sha
+        if semver_tag.is_tag_semver(semver_tag.remove_prefix(constants.PREFIX, tag_name)):
+            existing_tags[commit_sha] = tag_name
+    return existing_tags
+
+
+def resolve_merge_requests(commit_shas, workers=constants.BACKFILL_WORKERS):
+
+    """
+
+    The function resolves the merge requests of the commits in bulk, paging once through the merged merge requests of the project
+    and mapping their merge and squash commits, the per-commit api being only called for the commits which remain unresolved
+
+    :param commit_shas: full commit SHAs
+    :param workers: number of concurrent per-commit lookups
+    :return: commit SHA to merge request, None for commits without one
+    :rtype: dict
+
+    """
+
+    merged_merge_requests = api_backend.get_merged_merge_requests(os.environ["CI_PROJECT_ID"])
+    commit_merge_requests = {}
+    # the most recently created merge request comes first, like the per-commit api returns it
+    for merge_request in merged_merge_requests:
+        for commit_sha in (merge_request.get('merge_commit_sha'), merge_request.get('squash_commit_sha')):
+            if commit_sha:
+                commit_merge_requests.setdefault(commit_sha, merge_request)
+
+    merge_requests = {commit_sha: commit_merge_requests[commit_sha] for commit_sha in commit_shas if commit_sha in commit_merge_requests}
+    unresolved_shas = [commit_sha for commit_sha in commit_shas if commit_sha not in merge_requests]
+    print(f"{len(merge_requests)} commits resolved from {len(merged_merge_requests)} merged merge requests, {len(unresolved_shas)} left to the per-commit api")
+    merge_requests.update(zip(unresolved_shas, bump_ledger.resolve_merge_requests(unresolved_shas, semver_tag.extract_merge_request, workers)))
+    return merge_requests
+
+
+def plan_untagged_commits(base_version, untagged_commits, merge_requests):
+
+    """
+
+    The function works out the tags of the merge commits following a tagged commit, classifying and folding their bumps the same way the tagging script does
+
+    :param base_version: version without prefix of the last tagged commit
+    :param untagged_commits: full SHA and subject of the merge commits since then, oldest first
+    :param merge_requests: commit SHA to merge request, None for commits without one
+    :return: planned tags, oldest first
+    :rtype: list
+
+    """
+
+    commit_merge_requests = [merge_requests[commit_sha] for commit_sha, _ in untagged_commits]
+    versions = bump_ledger.fold(base_version, bump_ledger.classify(commit_merge_requests))
+    return [
+        {'commit': commit_sha, 'tag': f"{constants.PREFIX}{version}", 'message': merge_request['title'] if merge_request else subject, 'exists': False}
+        for (commit_sha, subject), merge_request, version in zip(untagged_commits, commit_merge_requests, versions)
+    ]
+
+
+def get_version_plan(from_tag=None, workers=constants.BACKFILL_WORKERS):
+
+    """
+
+    The function works out the version of every merge commit of the first-parent history
+
+    Commits which are already tagged keep their tag and the following versions are bumped from it,
+    whether they are merge commits or not (the tagging script tags squashed, fast-forwarded and directly pushed commits too)
+
+    :param from_tag: tag from which the history is walked, the root commit (version 0.0.0) if None
+    :param workers: number of concurrent per-commit merge request lookups
+    :return: planned tags, oldest first, each with its commit, tag name, message and whether it already exists
+    :rtype: list
+
+    """
+
+    existing_tags = get_existing_tags()
+    first_parent_commits = get_first_parent_history(from_tag)
+    untagged_shas = [commit_sha for commit_sha, _, is_merge_commit in first_parent_commits if is_merge_commit and commit_sha not in existing_tags]
+    merge_requests = resolve_merge_requests(untagged_shas, workers)
+
+    base_version = semver_tag.remove_prefix(constants.PREFIX, from_tag) if from_tag else '0.0.0'
+    version_plan = []
+    untagged_commits = []
+    for commit_sha, subject, is_merge_commit in first_parent_commits:
+        if commit_sha in existing_tags:
+            version_plan.extend(plan_untagged_commits(base_version, untagged_commits, merge_requests))
+            untagged_commits = []
+            tag_name = existing_tags[commit_sha]
+            base_version = semver_tag.remove_prefix(constants.PREFIX, tag_name)
+            version_plan.append({'commit': commit_sha, 'tag': tag_name, 'message': subject, 'exists': True})
+        elif is_merge_commit:
+            untagged_commits.append((commit_sha, subject))
+    version_plan.extend(plan_untagged_commits(base_version, untagged_commits, merge_requests))
+    return version_plan
+
+
+def create_missing_tags(version_plan, state_file, workers=constants.BACKFILL_TAG_WORKERS):
+
+    """
+
+    The function pushes the planned tags which don't exist yet, one after the other in history order by default
+
+    The release notes order the tags by their creation date, hence concurrent creations (workers > 1) are only suitable when that order doesn't matter
+    Tags recorded in the state file by a previous (interrupted) run and tags the api reports as existing on the same commit are skipped, so the backfill can be re-run safely,
+    whereas a tag name already used by another commit is reported as a failure
+
+    :param version_plan: planned tags as returned by get_version_plan
+    :param state_file: file recording the tags created so far
+    :param workers: number of concurrent tag creations
+    :return: number of tags created and failed
+    :rtype: tuple
+
+    """
+
+    created_tags = {}
+    if os.path.exists(state_file):
+        with open(state_file) as fp:
+            created_tags = json.load(fp)
+    missing_tags = [planned_tag for planned_tag in version_plan if not planned_tag['exists'] and planned_tag['tag'] not in created_tags]
+    print(f"{len(missing_tags)} tags to be created, {len(created_tags)} already created by a previous run")
+    state_lock = threading.Lock()
+
+    def create(planned_tag):
+        try:
+            tag_commit_response = semver_tag.tag_commit(planned_tag['tag'], planned_tag['commit'], planned_tag['message'])
+            if semver_tag.is_tag_conflict(tag_commit_response):
+                existing_tag = api_backend.get_tag(os.environ["CI_PROJECT_ID"], planned_tag['tag'])
+                if existing_tag is None or existing_tag['commit']['id'] != planned_tag['commit']:
+                    print(f"Failed to create the tag {planned_tag['tag']} as it already exists on another commit: {existing_tag}")
+                    return False
+                print(f"The tag {planned_tag['tag']} already exists on the commit {planned_tag['commit']}")
+            elif 'name' not in tag_commit_response:
+                print(f"Failed to create the tag {planned_tag['tag']}: {tag_commit_response}")
+                return False
+            with state_lock:
+                created_tags[planned_tag['tag']] = planned_tag['commit']
+                with open(state_file, 'w') as fp:
+                    json.dump(created_tags, fp, indent=2)
+            return True
+        except:
+            print(f"Oops !! An unhandled exception occured while creating the tag {planned_tag['tag']}")
+            traceback.print_exc()
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(create, missing_tags))
+    return results.count(True), results.count(False)
+
+
+def main(argv=None):
+
+    """
+
+    The functions pefroms the following steps:
+     - Walks the first-parent history once and resolves the merge requests of all the untagged merge commits in bulk, from a single listing of the merged merge requests
+     - Works out the version of every merge commit, restarting from the existing tags
+     - Prints the planned version map (and with --dry-run stops there)
+     - Creates the missing tags in history order, recording the progress in a state file so that an interrupted run can be resumed
+
+    """
+
+    parser = argparse.ArgumentParser(description='Backfill the semver tags of the whole first-parent history')
+    parser.add_argument('--from-tag', default=None, help='tag from which the history is walked (root commit by default)')
+    parser.add_argument('--dry-run', action='store_true', help='only print the planned version map')
+    parser.add_argument('--plan-output', default=None, help='file in which the planned version map is saved as json')
+    parser.add_argument('--state-file', default=constants.BACKFILL_STATE_FILE, help='file recording the tags created so far')
+    parser.add_argument('--workers', type=int, default=constants.BACKFILL_WORKERS, help='number of concurrent merge request lookups')
+    parser.add_argument('--tag-workers', type=int, default=constants.BACKFILL_TAG_WORKERS, help='number of concurrent tag creations, above 1 the creation dates of the tags no longer follow the history order')
+    args = parser.parse_args(argv)
+
+    version_plan = get_version_plan(args.from_tag, args.workers)
+    version_plan_json = json.dumps(version_plan, indent=2)
+    print(f"version_plan: {version_plan_json}")
+    if args.plan_output:
+        with open(args.plan_output, 'w') as fp:
+            fp.write(version_plan_json)
+    if args.dry_run:
+        return 0
+
+    created, failed = create_missing_tags(version_plan, args.state_file, args.tag_workers)
+    print(f"{created} tags created, {failed} tags failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
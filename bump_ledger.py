@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+import json
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import semver
+
+import constants
+
+BUMP_PATCH = 0
+BUMP_MINOR = 1
+BUMP_MAJOR = 2
+BUMP_NAMES = ('patch', 'minor', 'major')
+BUMP_LABELS = (None, constants.VERSION_MINOR, constants.VERSION_MAJOR)
+
+
+def get_bump_kind(merge_request_labels):
+
+    """
+
+    The function classifies a merge request by its version label
+
+    :param merge_request_labels: labels of the merge request
+    :return: BUMP_MAJOR, BUMP_MINOR or BUMP_PATCH
+    :rtype: int
+
+    """
+
+    if constants.VERSION_MAJOR in merge_request_labels:
+        return BUMP_MAJOR
+    elif constants.VERSION_MINOR in merge_request_labels:
+        return BUMP_MINOR
+    return BUMP_PATCH
+
+
+def resolve_merge_requests(commit_shas, get_merge_request, workers=constants.BUMP_LEDGER_WORKERS):
+
+    """
+
+    The function resolves the merge request of every commit concurrently
+
+    :param commit_shas: commits, oldest first
+    :param get_merge_request: function returning the merge request of a commit, or None if the commit has none
+    :param workers: number of concurrent lookups
+    :return: merge request of every commit (None for commits without one), in the order of commit_shas
+    :rtype: list
+
+    """
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(get_merge_request, commit_shas))
+
+
+def classify(merge_requests):
+
+    """
+
+    The function classifies all the merge requests into a compact array of bump kinds in one pass, commits without a merge request being patches
+
+    :param merge_requests: merge request of every commit, None for commits without one
+    :return: bump kind of every commit
+    :rtype: array
+
+    """
+
+    return array('b', (get_bump_kind(merge_request['labels']) if merge_request else BUMP_PATCH for merge_request in merge_requests))
+
+
+def fold(base_version, bump_kinds):
+
+    """
+
+    The function applies the bumps one after the other on integers, the base version being parsed once
+
+    Like semver.bump_major/minor/patch, a bump drops the prerelease and build parts of the version
+
+    :param base_version: version without prefix the bumps are applied to
+    :param bump_kinds: bump kind of every commit, oldest first
+    :return: resulting version after every commit
+    :rtype: list
+
+    """
+
+    version = semver.VersionInfo.parse(base_version)
+    major, minor, patch = version.major, version.minor, version.patch
+    versions = []
+    for bump_kind in bump_kinds:
+        if bump_kind == BUMP_MAJOR:
+            major, minor, patch = major + 1, 0, 0
+        elif bump_kind == BUMP_MINOR:
+            minor, patch = minor + 1, 0
+        else:
+            patch += 1
+        versions.append(f"{major}.{minor}.{patch}")
+    return versions
+
+
+def build_ledger(base_version, commit_shas, get_merge_request, workers=constants.BUMP_LEDGER_WORKERS):
+
+    """
+
+    The function works out the version after every commit since the last tag and keeps the reasoning behind each bump
+
+    :param base_version: version without prefix of the last tag
+    :param commit_shas: commits since the last tag, oldest first
+    :param get_merge_request: function returning the merge request of a commit, or None if the commit has none
+    :param workers: number of concurrent merge request lookups
+    :return: ledger entry (commit, mr, title, label, bump, version) of every commit, oldest first
+    :rtype: list
+
+    """
+
+    merge_requests = resolve_merge_requests(commit_shas, get_merge_request, workers)
+    bump_kinds = classify(merge_requests)
+    versions = fold(base_version, bump_kinds)
+    return [
+        {
+            'commit': commit_sha,
+            'mr': merge_request['iid'] if merge_request else None,
+            'title': merge_request['title'] if merge_request else None,
+            'label': BUMP_LABELS[bump_kind],
+            'bump': BUMP_NAMES[bump_kind],
+            'version': f"{constants.PREFIX}{version}",
+        }
+        for commit_sha, merge_request, bump_kind, version in zip(commit_shas, merge_requests, bump_kinds, versions)
+    ]
+
+
+def get_tag_message(ledger, max_lines=constants.BUMP_LEDGER_MESSAGE_MAX_LINES):
+
+    """
+
+    The function renders the ledger as a tag message: the title of the last merge request followed by one line per commit (the most recent ones if there are too many)
+
+    :param ledger: ledger as returned by build_ledger
+    :param max_lines: maximum number of ledger lines in the message
+    :return: tag message
+    :rtype: str
+
+    """
+
+    titles = [entry['title'] for entry in ledger if entry['title']]
+    lines = [titles[-1] if titles else ledger[-1]['version'], '']
+    if len(ledger) > max_lines:
+        lines.append(f"... {len(ledger) - max_lines} earlier commits, see {constants.BUMP_LEDGER_FILE}")
+    for entry in ledger[-max_lines:]:
+        merge_request = f"!{entry['mr']} {entry['title']}" if entry['mr'] else 'no merge request'
+        lines.append(f"{entry['commit']} {merge_request} ({entry['label'] or entry['bump']}) -> {entry['version']}")
+    return '\n'.join(lines)
+
+
+def save_ledger(ledger, path=constants.BUMP_LEDGER_FILE):
+    with open(path, 'w') as fp:
+        json.dump(ledger, fp, indent=2)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+import argparse
+import importlib
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RELEASE_NOTES_DIR = os.path.join(REPO_DIR, 'release-notes')
+
+# module backing every subcommand, only the module of the subcommand being run gets imported
+SUBCOMMAND_MODULES = {
+    'tag': 'test',
+    'label': 'labels',
+    'mr-template': 'mr_template',
+    'mr-info': 'mr_info',
+    'tags-range': 'get_tags',
+    'csv': 'generate_csv',
+    'backfill': 'backfill',
+    'version-plan': 'version_plan',
+}
+RELEASE_NOTES_SUBCOMMANDS = ('mr-info', 'tags-range', 'csv')
+
+
+def import_subcommand(subcommand):
+
+    """
+
+    The function imports the module backing a subcommand
+
+    The release notes modules share names with the top level ones (e.g. mr_template), hence their directory is put first on the path
+
+    :param subcommand: name of the subcommand
+    :return: module of the subcommand
+    :rtype: module
+
+    """
+
+    if subcommand in RELEASE_NOTES_SUBCOMMANDS:
+        sys.path.insert(0, RELEASE_NOTES_DIR)
+    else:
+        sys.path.insert(0, REPO_DIR)
+    return importlib.import_module(SUBCOMMAND_MODULES[subcommand])
+
+
+def set_backend(args):
+    if args.backend:
+        os.environ['SEMVER_BACKEND'] = args.backend
+
+
+def run_tag(args):
+    set_backend(args)
+    return import_subcommand('tag').main()
+
+
+def run_label(args):
+    return import_subcommand('label').main(args.extra_args)
+
+
+def run_mr_template(args):
+    return import_subcommand('mr-template').main(args.extra_args)
+
+
+def run_mr_info(args):
+    mr_info = import_subcommand('mr-info').MrInfo()
+    if args.mr_iids:
+        mr_info.save_mr_info(mr_info.get_mr_infos(args.mr_iids))
+        return 0
+    return mr_info.get_mr_info()
+
+
+def run_tags_range(args):
+    set_backend(args)
+    tags = import_subcommand('tags-range').Tags()
+    if not args.no_fetch:
+        tags.fetch_all_tags(args.pattern)
+    tags_for_release_notes = tags.get_tags_for_release_notes(args.previous_tag, args.current_tag, args.pattern)
+    return 0 if tags_for_release_notes else 1
+
+
+def run_csv(args):
+    return import_subcommand('csv').main(args.input, args.output)
+
+
+def run_backfill(args):
+    return import_subcommand('backfill').main(args.extra_args)
+
+
+def run_version_plan(args):
+    return import_subcommand('version-plan').main(args.extra_args)
+
+
+def run_bench_imports(args):
+
+    """
+
+    The function measures, in a fresh interpreter per subcommand, the wall time of starting python and importing the subcommand's module,
+    along with the import time reported by 'python -X importtime' and the slowest modules imported
+
+    """
+
+    import re
+    import subprocess
+    import time
+
+    def measure(code):
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_DIR, capture_output=True, text=True)
+        wall_time = time.perf_counter() - start
+        # lines look like: 'import time:       123 |       4567 |   package.module'
+        imports = []
+        for line in completed.stderr.splitlines():
+            match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+            if match:
+                imports.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+        top_level = [cumulative for cumulative, indent, name in imports if indent == 1]
+        slowest = sorted((import_ for import_ in imports if import_[1] == 1), reverse=True)[:args.top]
+        return completed.returncode, wall_time, sum(top_level) / 1e6, slowest
+
+    returncode, baseline, _, _ = measure('pass')
+    print(f"{'subcommand':<14}{'wall (s)':>10}{'imports (s)':>13}  slowest imports")
+    print(f"{'<baseline>':<14}{baseline:>10.3f}{'':>13}")
+    for subcommand in args.subcommands or SUBCOMMAND_MODULES:
+        if subcommand not in SUBCOMMAND_MODULES:
+            print(f"{subcommand:<14}unknown subcommand")
+            continue
+        returncode, wall_time, import_time, slowest = measure(f"import cli; cli.import_subcommand({subcommand!r})")
+        if returncode:
+            print(f"{subcommand:<14}failed to import, is a dependency missing?")
+            continue
+        slowest = ', '.join(f"{name} {cumulative / 1e3:.0f}ms" for cumulative, indent, name in slowest)
+        print(f"{subcommand:<14}{wall_time:>10.3f}{import_time:>13.3f}  {slowest}")
+    return 0
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Semver tagging and release notes tooling')
+    parser.add_argument('--profile', action='store_true', help='profile the subcommand, see profiling.py (same as SEMVER_PROFILE=1)')
+    subparsers = parser.add_subparsers(dest='subcommand', required=True)
+
+    tag = subparsers.add_parser('tag', help='push the next semver tag for the current commit')
+    tag.add_argument('--backend', choices=['git', 'api'], default=None, help='work out the tags from the local git history or the gitlab api (SEMVER_BACKEND by default)')
+    tag.set_defaults(run=run_tag)
+    subparsers.add_parser('label', add_help=False, help='label the current merge request, or with --batch all the open ones (see labels.py --help)').set_defaults(run=run_label)
+    subparsers.add_parser('mr-template', add_help=False, help='save the merge request template checkboxes in mr_template.json, or with --batch those of all the target branches (see mr_template.py --help)').set_defaults(run=run_mr_template)
+    mr_info = subparsers.add_parser('mr-info', help='save the merge request template and jira ids in mr_info.json')
+    mr_info.add_argument('mr_iids', nargs='*', help='merge requests to be processed together, the merge request of the current commit by default')
+    mr_info.set_defaults(run=run_mr_info)
+
+    tags_range = subparsers.add_parser('tags-range', help='list the tags between two tags')
+    tags_range.add_argument('previous_tag')
+    tags_range.add_argument('current_tag')
+    tags_range.add_argument('--pattern', default=None, help="tags pattern, e.g. 'v[0-9]*'")
+    tags_range.add_argument('--backend', choices=['git', 'api'], default=None, help='list the tags from the local repo or the gitlab api (SEMVER_BACKEND by default)')
+    tags_range.add_argument('--no-fetch', action='store_true', help='skip fetching the tags from the remote repo')
+    tags_range.set_defaults(run=run_tags_range)
+
+    csv = subparsers.add_parser('csv', help='convert the test report json into a csv')
+    csv.add_argument('--input', default='test_report.json')
+    csv.add_argument('--output', default='test_report.csv')
+    csv.set_defaults(run=run_csv)
+
+    backfill = subparsers.add_parser('backfill', add_help=False, help='tag every merge commit of the history (see backfill.py --help)')
+    backfill.set_defaults(run=run_backfill)
+
+    version_plan = subparsers.add_parser('version-plan', add_help=False, help='plan the tag in the merge request pipeline and apply it after the merge (see version_plan.py --help)')
+    version_plan.set_defaults(run=run_version_plan)
+
+    bench_imports = subparsers.add_parser('bench-imports', help='measure the startup and import time of every subcommand')
+    bench_imports.add_argument('subcommands', nargs='*', metavar='subcommand', help='subcommands to be measured (all by default)')
+    bench_imports.add_argument('--top', type=int, default=3, help='number of slowest imports to show')
+    bench_imports.set_defaults(run=run_bench_imports)
+
+    # the label, mr-template, backfill and version-plan options are parsed by their own modules
+    args, args.extra_args = parser.parse_known_args()
+    if args.profile:
+        os.environ['SEMVER_PROFILE'] = '1'
+    if args.extra_args and args.subcommand not in ('label', 'mr-template', 'backfill', 'version-plan'):
+        parser.error(f"unrecognized arguments: {' '.join(args.extra_args)}")
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
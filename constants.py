@@ -1,5 +1,53 @@
+import os
+
 VERSION_MAJOR = 'version::major'
 VERSION_MINOR = 'version::minor'
 CI_PRIVATE_TOKEN = 'CI_PRIVATE_TOKEN'
-BASE_ENDPOINT= 'https://gitlab.com/api/v4'
+# CI_API_V4_URL is set by gitlab in every job, it can also point to a local api stand-in
+BASE_ENDPOINT= os.environ.get('CI_API_V4_URL', 'https://gitlab.com/api/v4')
 PREFIX = 'v'
+ENABLED_CHECKBOX_MARKDOWN = '- [x]'
+DISABLED_CHECKBOX_MARKDOWN = '- [ ]'
+PRIORITY_TAGGING = 0
+PRIORITY_LABELS = 1
+PRIORITY_RELEASE_NOTES = 2
+SCHEDULER_INITIAL_CONCURRENCY = 4
+SCHEDULER_MIN_CONCURRENCY = 1
+SCHEDULER_MAX_CONCURRENCY = 16
+SCHEDULER_BACKOFF_FACTOR = 0.5
+SCHEDULER_LATENCY_TOLERANCE = 2.0
+SCHEDULER_RATE_LIMIT_LOW_WATERMARK = 0.1
+SCHEDULER_MAX_RETRIES = 3
+SCHEDULER_RETRY_BASE_DELAY = 0.5
+SCHEDULER_RETRY_MAX_DELAY = 30
+WEBHOOK_PORT = 8080
+WEBHOOK_DEBOUNCE_SECONDS = 5
+WEBHOOK_MIRROR_ROOT = '.webhook-mirrors'
+WEBHOOK_BRANCHES = 'main'
+BACKFILL_WORKERS = 8
+BACKFILL_TAG_WORKERS = 1
+BACKFILL_STATE_FILE = 'backfill_state.json'
+SEMVER_BACKEND = 'SEMVER_BACKEND'
+SEMVER_BACKEND_GIT = 'git'
+SEMVER_BACKEND_API = 'api'
+API_PER_PAGE = 100
+REQUEST_CACHE_TTL = 300
+REQUEST_CACHE_MAX_ENTRIES = 1024
+TYPE_OF_CHANGE_HEADER_TEXT = 'Please check the type of change your MR introduces:'
+BREAKING_CHANGE_CHECKBOX = 'Breaking change'
+NEW_FEATURE_CHECKBOX = 'New feature'
+LABEL_WORKERS = 8
+VERSION_PLAN_FILE = 'version_plan.json'
+VERSION_PLAN_JOB = 'plan_semver_tag'
+SEMVER_PROFILE = 'SEMVER_PROFILE'
+SEMVER_PROFILE_DIR = 'SEMVER_PROFILE_DIR'
+PROFILE_DIR = 'profile'
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_TOP_ALLOCATIONS = 10
+BUMP_LEDGER_FILE = 'bump_ledger.json'
+BUMP_LEDGER_WORKERS = 8
+BUMP_LEDGER_MESSAGE_MAX_LINES = 50
+TAG_MAX_ATTEMPTS = 5
+MR_TEMPLATES_FILE = 'mr_templates.json'
+MR_TEMPLATE_WORKERS = 8
+API_STAND_IN_PORT = 8081
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+import constants
+import profiling
+from request_cache import RequestCoalescer
+
+
+class RequestScheduler():
+
+    """
+
+    Every GitLab API call goes through the scheduler, which:
+     - Limits the number of requests in flight, adapting the limit with AIMD (additive increase, multiplicative decrease)
+     - Backs off when the latency spikes, the RateLimit-Remaining header runs low or the api answers with 429/5xx
+     - Pauses all the requests until the time advertised by the Retry-After (or RateLimit-Reset) header
+     - Hands out free slots by priority, so the tagging path goes ahead of the release notes traffic
+
+    """
+
+    def __init__(self, initial_concurrency=constants.SCHEDULER_INITIAL_CONCURRENCY, min_concurrency=constants.SCHEDULER_MIN_CONCURRENCY, max_concurrency=constants.SCHEDULER_MAX_CONCURRENCY):
+        self.concurrency = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.waiters = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.resume_at = 0.0
+        self.last_decrease_at = 0.0
+        self.latency_baseline = None
+        self.session = None
+
+    def get_session(self):
+
+        """
+
+        The function lazily creates the pooled http session shared by all the requests, so that importing the scheduler doesn't import requests
+
+        :return: http session
+        :rtype: requests.Session
+
+        """
+
+        with self.condition:
+            if self.session is None:
+                import requests
+                self.session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_concurrency, pool_maxsize=self.max_concurrency)
+                self.session.mount('https://', adapter)
+                self.session.mount('http://', adapter)
+            return self.session
+
+    def request(self, method, url, priority=constants.PRIORITY_RELEASE_NOTES, **kwargs):
+
+        """
+
+        The function sends a request once a slot is free for its priority, retrying the rate limited (429) and unavailable (503) responses
+
+        The retries wait for the delay advised by the api (see adapt), or when the api gives none, for an exponential backoff with full jitter
+        so that the clients throttled at the same time don't retry in lockstep
+
+        :param method: http method
+        :param url: endpoint of the request
+        :param priority: priority of the request, lower values are served first
+        :param kwargs: keyword arguments passed on to requests
+        :return: api response
+        :rtype: requests.Response
+
+        """
+
+        for attempt in range(constants.SCHEDULER_MAX_RETRIES + 1):
+            with profiling.timed('http_queue'):
+                self.acquire(priority)
+            start = time.monotonic()
+            try:
+                with profiling.timed('http'):
+                    response = self.get_session().request(method, url, **kwargs)
+            except:
+                self.release(None, time.monotonic() - start)
+                raise
+            self.release(response, time.monotonic() - start)
+            if response.status_code not in (429, 503) or attempt == constants.SCHEDULER_MAX_RETRIES:
+                return response
+            if get_retry_after(response.headers) is None:
+                backoff = random.uniform(0, min(constants.SCHEDULER_RETRY_MAX_DELAY, constants.SCHEDULER_RETRY_BASE_DELAY * 2 ** attempt))
+                print(f"Retrying the request in {backoff:.1f}s as the api responded with {response.status_code}, endpoint is: {url}")
+                time.sleep(backoff)
+            else:
+                print(f"Retrying the request as the api responded with {response.status_code}, endpoint is: {url}")
+
+    def acquire(self, priority):
+
+        """
+
+        The function blocks until the request is at the head of the queue, the scheduler is not paused and the concurrency limit allows one more request
+
+        :param priority: priority of the request, lower values are served first
+
+        """
+
+        with self.condition:
+            entry = (priority, next(self.sequence))
+            heapq.heappush(self.waiters, entry)
+            while True:
+                pause = self.resume_at - time.monotonic()
+                if pause <= 0 and self.waiters[0] == entry and self.in_flight < max(int(self.concurrency), self.min_concurrency):
+                    heapq.heappop(self.waiters)
+                    self.in_flight += 1
+                    self.condition.notify_all()
+                    return
+                self.condition.wait(timeout=pause if pause > 0 else None)
+
+    def release(self, response, latency):
+
+        """
+
+        The function frees the slot of a completed request and adapts the concurrency limit based on its outcome
+
+        :param response: api response, None if the request failed without a response
+        :param latency: time taken by the request in seconds
+
+        """
+
+        with self.condition:
+            self.in_flight -= 1
+            self.adapt(response, latency)
+            self.condition.notify_all()
+
+    def adapt(self, response, latency):
+
+        """
+
+        The function applies the AIMD rule: the concurrency limit grows by 1/limit for every healthy response and is multiplied by the backoff factor on congestion signals
+
+        :param response: api response, None if the request failed without a response
+        :param latency: time taken by the request in seconds
+
+        """
+
+        now = time.monotonic()
+        congested = response is None or response.status_code == 429 or response.status_code >= 500
+
+        if response is not None:
+            retry_after = get_retry_after(response.headers)
+            if retry_after is not None:
+                print(f"Pausing the api requests for {retry_after:.1f}s as advised by the api")
+                self.resume_at = max(self.resume_at, now + retry_after)
+                congested = True
+
+            remaining = response.headers.get('RateLimit-Remaining')
+            limit = response.headers.get('RateLimit-Limit')
+            if remaining is not None and limit is not None and remaining.isdigit() and limit.isdigit():
+                if int(remaining) <= int(limit) * constants.SCHEDULER_RATE_LIMIT_LOW_WATERMARK:
+                    congested = True
+
+        if self.latency_baseline is None:
+            self.latency_baseline = latency
+        elif latency > self.latency_baseline * constants.SCHEDULER_LATENCY_TOLERANCE:
+            congested = True
+        else:
+            self.latency_baseline = 0.8 * self.latency_baseline + 0.2 * latency
+
+        if congested:
+            # decrease at most once per round trip, so a burst of slow responses counts as a single congestion event
+            if now - self.last_decrease_at >= (self.latency_baseline or 0):
+                self.concurrency = max(self.min_concurrency, self.concurrency * constants.SCHEDULER_BACKOFF_FACTOR)
+                self.last_decrease_at = now
+        else:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+
+
+def get_retry_after(headers):
+
+    """
+
+    The function reads the delay advised by the api, either through the Retry-After header (seconds or http date) or, when the rate limit is exhausted, the RateLimit-Reset header (epoch seconds)
+
+    :param headers: response headers
+    :return: delay in seconds or None if the api did not ask to wait
+    :rtype: float or None
+
+    """
+
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        # email.utils is slow to import and only needed for the rarely used http date form
+        import email.utils
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            print(f"Ignoring the unparseable Retry-After header: {retry_after}")
+
+    reset = headers.get('RateLimit-Reset')
+    if headers.get('RateLimit-Remaining') == '0' and reset and reset.isdigit():
+        return max(0.0, int(reset) - time.time())
+    return None
+
+
+scheduler = RequestScheduler()
+request_cache = RequestCoalescer()
+
+
+def get_headers():
+
+    """
+
+    The function returns the authentication headers of the tagging scripts, the same for every caller so that their identical requests share the request cache
+
+    :return: private token header
+    :rtype: dict
+
+    """
+
+    return {"PRIVATE-TOKEN": os.environ.get(constants.CI_PRIVATE_TOKEN) or os.environ.get('GITLAB_TOKEN')}
+
+
+def get(url, priority=constants.PRIORITY_RELEASE_NOTES, **kwargs):
+    return scheduler.request('GET', url, priority, **kwargs)
+
+
+def put(url, priority=constants.PRIORITY_RELEASE_NOTES, **kwargs):
+    return scheduler.request('PUT', url, priority, **kwargs)
+
+
+def post(url, priority=constants.PRIORITY_RELEASE_NOTES, **kwargs):
+    return scheduler.request('POST', url, priority, **kwargs)
+
+
+def get_json(url, priority=constants.PRIORITY_RELEASE_NOTES, headers=None, params=None):
+
+    """
+
+    The function sends a GET request and decodes its json body, sharing the in-flight call and the decoded result with every identical request of the process
+
+    :param url: endpoint of the request
+    :param priority: priority of the request, lower values are served first
+    :param headers: headers of the request
+    :param params: query parameters of the request
+    :return: decoded json body, shared between the callers hence not to be mutated
+    :rtype: object
+    :raises requests.exceptions.HTTPError: if the api responds with an error status
+
+    """
+
+    # header names are case insensitive, hence PRIVATE-TOKEN and Private-Token requests share their entry
+    key = (url, tuple(sorted((params or {}).items())), tuple(sorted((name.lower(), value) for name, value in (headers or {}).items())))
+
+    def fetch():
+        response = scheduler.request('GET', url, priority, headers=headers, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    return request_cache.get(key, fetch)
@@ -1,26 +1,181 @@
 #!/usr/bin/env python3
+import argparse
+import importlib.util
 import os
-import re
 import sys
-import semver
-import subprocess
-import requests
-import re
+from concurrent.futures import ThreadPoolExecutor
 
 import constants
+import gitlab_scheduler
 
+RELEASE_NOTES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'release-notes')
+VERSION_LABELS = (constants.VERSION_MAJOR, constants.VERSION_MINOR)
 
-def main():
+# the release notes mr_template shares its module name with the top level one, hence it is loaded from its path under its own name,
+# its release_notes_constants import being resolved from the end of the path so that no top level module gets shadowed
+sys.path.append(RELEASE_NOTES_DIR)
+release_notes_mr_template_spec = importlib.util.spec_from_file_location('release_notes_mr_template', os.path.join(RELEASE_NOTES_DIR, 'mr_template.py'))
+release_notes_mr_template = importlib.util.module_from_spec(release_notes_mr_template_spec)
+release_notes_mr_template_spec.loader.exec_module(release_notes_mr_template)
+
+
+def get_open_mrs(project_id):
+
+    """
+
+    The function gets all the open merge requests of a project through gitlab's merge requests api
+
+    :param project_id: gitlab project id
+    :return: open merge requests
+    :rtype: list
+
+    """
+
+    import api_backend
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/merge_requests"
+    print(f"Getting all the open merge requests, endpoint is: {endpoint}")
+    return api_backend.get_all_pages(endpoint, {'state': 'opened'}, constants.PRIORITY_LABELS)
+
+
+def get_checked_change_types(mr, mr_template):
+
+    """
+
+    The function gets the checked 'Type of change' checkboxes of a merge request's description
+
+    :param mr: merge request
+    :param mr_template: MrTemplate used to parse the checkboxes
+    :return: text of the checked checkboxes
+    :rtype: list
+
+    """
+
+    mr_template_dict = mr_template.get_mr_template_dict(mr, constants.TYPE_OF_CHANGE_HEADER_TEXT) or {}
+    return mr_template_dict.get('impacted_components', [])
+
+
+def infer_version_label(impacted_components):
+
+    """
+
+    The function infers the version label of a merge request from its checked 'Type of change' checkboxes
+
+    :param impacted_components: text of the checked checkboxes, see get_checked_change_types
+    :return: version::major for a breaking change, version::minor for a new feature, None otherwise (patch)
+    :rtype: str or None
+
+    """
+
+    # the checkbox text may be followed by a description, but must start with the expected text ("Not a Breaking change" must not match)
+    if any(component.startswith(constants.BREAKING_CHANGE_CHECKBOX) for component in impacted_components):
+        return constants.VERSION_MAJOR
+    if any(component.startswith(constants.NEW_FEATURE_CHECKBOX) for component in impacted_components):
+        return constants.VERSION_MINOR
+    return None
+
+
+def get_label_changes(mrs):
+
+    """
+
+    The function works out, for every merge request, the version labels to be added and removed so that its labels match its template
+
+    Merge requests listed more than once are only considered once, merge requests whose labels are already right are left out
+    and so are the ones whose description doesn't contain the 'Type of change' section or has none of its boxes checked,
+    as nothing can be inferred from them (and their labels may have been set by hand)
+
+    :param mrs: merge requests
+    :return: merge request iid to the labels to be added and removed
+    :rtype: dict
+
+    """
+
+    mr_template = release_notes_mr_template.MrTemplate()
+
+    label_changes = {}
+    for mr in {mr['iid']: mr for mr in mrs}.values():
+        if constants.TYPE_OF_CHANGE_HEADER_TEXT not in (mr['description'] or ''):
+            continue
+        checked_change_types = get_checked_change_types(mr, mr_template)
+        if not checked_change_types:
+            continue
+        version_label = infer_version_label(checked_change_types)
+        current_labels = set(mr['labels']).intersection(VERSION_LABELS)
+        desired_labels = {version_label} if version_label else set()
+        add_labels = sorted(desired_labels - current_labels)
+        remove_labels = sorted(current_labels - desired_labels)
+        if add_labels or remove_labels:
+            label_changes[mr['iid']] = (add_labels, remove_labels)
+    return label_changes
+
+
+def apply_label_changes(project_id, label_changes, workers=constants.LABEL_WORKERS):
+
+    """
+
+    The function updates the labels of the merge requests concurrently
+
+    :param project_id: gitlab project id
+    :param label_changes: merge request iid to the labels to be added and removed
+    :param workers: number of concurrent updates
+    :return: number of merge requests whose update failed
+    :rtype: int
+
+    """
+
+    def apply(label_change):
+        mr_iid, (add_labels, remove_labels) = label_change
+        endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/merge_requests/{mr_iid}"
+        print(f"Updating the labels of merge request {mr_iid}, adding {add_labels} and removing {remove_labels}")
+        mr_response = gitlab_scheduler.put(endpoint, priority=constants.PRIORITY_LABELS, headers = {"PRIVATE-TOKEN": os.environ.get(constants.CI_PRIVATE_TOKEN)}, params={'add_labels': ','.join(add_labels), 'remove_labels': ','.join(remove_labels)})
+        if not mr_response.ok:
+            print(f"Failed to update the labels of merge request {mr_iid}: {mr_response.text}")
+        return mr_response.ok
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(apply, label_changes.items())).count(False)
+
+
+def batch_label(project_id, dry_run=False, workers=constants.LABEL_WORKERS):
+
+    """
+
+    The functions pefroms the following steps:
+     - Gets all the open merge requests of the project
+     - Infers their version label from the 'Type of change' checkboxes of their template
+     - Applies only the label changes which differ from their current labels, concurrently
+
+    """
+
+    mrs = get_open_mrs(project_id)
+    label_changes = get_label_changes(mrs)
+    print(f"{len(label_changes)} of {len(mrs)} open merge requests need their version labels updated: {label_changes}")
+    if dry_run or not label_changes:
+        return 0
+    failed = apply_label_changes(project_id, label_changes, workers)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description='Label merge requests with their version bump')
+    parser.add_argument('--batch', action='store_true', help="relabel all the open merge requests from their 'Type of change' checkboxes")
+    parser.add_argument('--dry-run', action='store_true', help='with --batch, only print the label changes')
+    parser.add_argument('--workers', type=int, default=constants.LABEL_WORKERS)
+    args = parser.parse_args(argv)
 
     project_id = os.environ["CI_PROJECT_ID"]
     print('project_id', project_id)
+    if args.batch:
+        return batch_label(project_id, args.dry_run, args.workers)
+
     merge_request_iid = os.environ["CI_MERGE_REQUEST_IID"]
     print('merge_request_iid', merge_request_iid)
     if merge_request_iid != '$CI_MERGE_REQUEST_IID':
 
         endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/merge_requests/{merge_request_iid}?labels=version::minor"
         print(f'Pushing the commit to the remote repository, endpoint is: {endpoint}')
-        mr_response = requests.put(endpoint, headers = {"PRIVATE-TOKEN": os.environ.get(constants.CI_PRIVATE_TOKEN)})
+        mr_response = gitlab_scheduler.put(endpoint, priority=constants.PRIORITY_LABELS, headers = {"PRIVATE-TOKEN": os.environ.get(constants.CI_PRIVATE_TOKEN)})
         print('mr_response', mr_response.json())
     else:
         print('merge_request_iid is blank')
@@ -1,29 +1,30 @@
 #!/usr/bin/env python3
+import argparse
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import json
-import mr_template_constants
-import argparse
+import constants
+import gitlab_scheduler
 
 env_vars = os.environ.copy()
 
-def get_commit_mrs():
+def get_commit_mrs(commit_sha=None):
 
     """
 
     The function hits the commits api and gets all the merge requests corresponding to it
 
+    :param commit_sha: commit whose merge requests are retrieved, the current commit (i.e., CI_COMMIT_SHORT_SHA) if None
     :return: commit's merge requests
     :rtype: object
 
     """
     try:
-        endpoint = f"{mr_template_constants.GITLAB_BASE_ENDPOINT}/projects/{env_vars['CI_PROJECT_ID']}/repository/commits/{env_vars['CI_COMMIT_SHORT_SHA']}/merge_requests"
+        endpoint = f"{constants.BASE_ENDPOINT}/projects/{env_vars['CI_PROJECT_ID']}/repository/commits/{commit_sha or env_vars['CI_COMMIT_SHORT_SHA']}/merge_requests"
         print(f"Getting the list of all the merge requests corresponding to the given commit, endpoint is: {endpoint}")
-        commit_mrs = requests.get(endpoint, headers = {"PRIVATE-TOKEN": env_vars['GITLAB_TOKEN']})
-        commit_mrs.raise_for_status()
-        commit_mrs = commit_mrs.json()
+        commit_mrs = gitlab_scheduler.get_json(endpoint, priority=constants.PRIORITY_RELEASE_NOTES, headers = {"PRIVATE-TOKEN": env_vars['GITLAB_TOKEN']})
         return commit_mrs
     except requests.exceptions.HTTPError as err:
         print(err)
@@ -42,14 +43,54 @@ def get_mr_for_target_branch(commit_mrs):
 
     try:
         if commit_mrs:
-            mr_for_target_branch = list(filter(lambda x: x['target_branch'] == env_vars['CI_COMMIT_BRANCH'], commit_mrs))
+            mr_for_target_branch = group_mrs_by_target_branch(commit_mrs).get(env_vars['CI_COMMIT_BRANCH'])
             print('mr_for_target_branch', mr_for_target_branch)
-            mr_for_target_branch = mr_for_target_branch[0]
             return mr_for_target_branch
     except RuntimeError as re:
         print(re)
         print('An error occurred while fetching the merge request corresponding to the target branch')
 
+def group_mrs_by_target_branch(commit_mrs):
+
+    """
+
+    The function keys the merge requests of a commit by their target branch in a single pass, keeping the first merge request of every branch
+    :param commit_mrs: all the merge requests of a commit
+    :return: target branch to merge request
+    :rtype: dict
+
+    """
+
+    mrs_by_target_branch = {}
+    for mr in commit_mrs:
+        mrs_by_target_branch.setdefault(mr['target_branch'], mr)
+    return mrs_by_target_branch
+
+
+def parse_mr_template(mr, header_text):
+
+    """
+
+    The function scans the description of a merge request once, from the first occurrence of the header text, and returns its checkboxes
+    :param: mr: merge request
+    :param: header_text: text following which the component checkboxes need to be captured
+    :return: dictionary of checkboxes along with their enabled/disabled information, None if the description has no header text
+    :rtype: dict or None
+
+    """
+
+    mr_template = mr['description']
+    if not mr_template:
+        print(f"Skipping the merge request {mr['iid']} as it does not have any description")
+        return
+    mr_template = mr_template.splitlines()
+    try:
+        header_text_index = mr_template.index(header_text)
+    except ValueError:
+        print(f"merge request template of {mr['iid']} does not contain the header text: {header_text}")
+        return
+    return create_mr_template_dict(mr['iid'], mr_template, header_text, header_text_index+1)
+
 
 def create_mr_template_json(mr_for_target_branch, header_text):
 
@@ -62,29 +103,49 @@ def create_mr_template_json(mr_for_target_branch, header_text):
     """
 
     try:
-        mr_template = mr_for_target_branch['description']
-        if mr_template:
-            mr_template = mr_template.splitlines()
-            if header_text in mr_template:
-                for i, val in enumerate(mr_template):
-                    if val == header_text:
-                        mr_template_dict = create_mr_template_dict(mr_for_target_branch['iid'], mr_template, header_text, i+1)
-                        print('mr_template_dict', mr_template_dict)
-                        if mr_template_dict:
-                            with open("mr_template.json", "w") as fp:
-                                json.dump(mr_template_dict, fp)
-                            break
-                        else:
-                            print(f"No checkboxes found for the merge request header text: {header_text}")
-            else:
-                print(f"merge request template does not contain the header text: {header_text}")
-        else:
-            print('Skipping the creation of merge request template json as the does not have any description')
+        mr_template_dict = parse_mr_template(mr_for_target_branch, header_text)
+        print('mr_template_dict', mr_template_dict)
+        if mr_template_dict:
+            with open("mr_template.json", "w") as fp:
+                json.dump(mr_template_dict, fp)
     except RuntimeError as re:
         print(re)
         print('An error occurred while creating the merge request template json')
 
 
+def create_mr_templates_json(commit_shas, header_text, workers=constants.MR_TEMPLATE_WORKERS, path=constants.MR_TEMPLATES_FILE):
+
+    """
+
+    The function saves the templates of the merge requests of all the target branches of one or several commits (e.g. cherry-picked or merged to several release branches) in a single json file
+    The merge requests of the commits are fetched concurrently and the description of a merge request shared by several commits is only parsed once
+    :param: commit_shas: commits whose merge request templates are saved
+    :param: header_text: text following which the component checkboxes need to be captured
+    :param: workers: number of concurrent merge request lookups
+    :param: path: json file in which the templates are saved, keyed by commit and then by target branch
+    :return: templates keyed by commit and then by target branch
+    :rtype: dict
+
+    """
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        commits_mrs = list(executor.map(get_commit_mrs, commit_shas))
+
+    mr_templates = {}
+    mr_template_dicts = {}
+    for commit_sha, commit_mrs in zip(commit_shas, commits_mrs):
+        mr_templates[commit_sha] = {}
+        for target_branch, mr in group_mrs_by_target_branch(commit_mrs or []).items():
+            if mr['iid'] not in mr_template_dicts:
+                mr_template_dicts[mr['iid']] = parse_mr_template(mr, header_text)
+            if mr_template_dicts[mr['iid']]:
+                mr_templates[commit_sha][target_branch] = mr_template_dicts[mr['iid']]
+        print(f"Merge request templates found for the commit {commit_sha} on the target branches: {list(mr_templates[commit_sha])}")
+
+    with open(path, "w") as fp:
+        json.dump(mr_templates, fp, indent=2)
+    return mr_templates
+
 
 def create_mr_template_dict(mr_iid, mr_template, header_text, header_text_index):
 
@@ -103,12 +164,13 @@ def create_mr_template_dict(mr_iid, mr_template, header_text, header_text_index)
 
         for val in range(header_text_index, len(mr_template)):
             mr_template[val] = mr_template[val].strip()
-            if mr_template[val].startswith(mr_template_constants.ENABLED_CHECKBOX_MARKDOWN):
-                checkbox_text = mr_template[val].split(mr_template_constants.ENABLED_CHECKBOX_MARKDOWN)
-                mr_template_dict["template_info"]["impacted_components"].append(checkbox_text[1])
-            elif mr_template[val].startswith(mr_template_constants.DISABLED_CHECKBOX_MARKDOWN):
-                checkbox_text = mr_template[val].split(mr_template_constants.DISABLED_CHECKBOX_MARKDOWN)
-                mr_template_dict["template_info"]["non_impacted_components"].append(checkbox_text[1])
+            # gitlab keeps the checked boxes as typed, hence '- [X]' is as checked as '- [x]'
+            if mr_template[val].lower().startswith(constants.ENABLED_CHECKBOX_MARKDOWN):
+                checkbox_text = mr_template[val][len(constants.ENABLED_CHECKBOX_MARKDOWN):]
+                mr_template_dict["template_info"]["impacted_components"].append(checkbox_text.strip())
+            elif mr_template[val].startswith(constants.DISABLED_CHECKBOX_MARKDOWN):
+                checkbox_text = mr_template[val].split(constants.DISABLED_CHECKBOX_MARKDOWN)
+                mr_template_dict["template_info"]["non_impacted_components"].append(checkbox_text[1].strip())
             elif mr_template[val] is None or mr_template[val] == '' or mr_template[val] == ' ':
                 continue
             else:
@@ -121,7 +183,7 @@ def create_mr_template_dict(mr_iid, mr_template, header_text, header_text_index)
 
 
 
-def main():
+def main(argv=None):
 
     """
 
@@ -130,9 +192,20 @@ def main():
      - Looks for the Header Text corresponding to which the checkboxes should be retrieved
      - Grabs the content corresponding to the chekboxes along  with their enabled/disabled information and stores them in a json file
 
+    With --batch, the templates of the merge requests of all the target branches of the given commits (the current commit by default) are saved together in mr_templates.json
+
     """
 
+    parser = argparse.ArgumentParser(description='Save the merge request template checkboxes')
+    parser.add_argument('--batch', action='store_true', help='save the templates of all the target branches in mr_templates.json')
+    parser.add_argument('commits', nargs='*', help='with --batch, commits whose merge request templates are saved (the current commit by default)')
+    parser.add_argument('--workers', type=int, default=constants.MR_TEMPLATE_WORKERS)
+    args = parser.parse_args(argv)
+
     try:
+        if args.batch:
+            create_mr_templates_json(args.commits or [env_vars['CI_COMMIT_SHORT_SHA']], env_vars['MERGE_REQUEST_HEADER_TEXT'], args.workers)
+            return 0
         commit_mrs = get_commit_mrs()
         if commit_mrs:
             mr_for_target_branch = get_mr_for_target_branch(commit_mrs)
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import constants
+
+timings = Counter()
+timings_lock = threading.Lock()
+active_profile = threading.Lock()
+
+
+def is_profiling_enabled():
+    return os.environ.get(constants.SEMVER_PROFILE, '').lower() in ('1', 'true', 'yes')
+
+
+@contextmanager
+def timed(category):
+
+    """
+
+    The context manager adds the time spent in its block to a category (e.g. git, http), so that a profile can tell the subprocess and network waits apart from the python cpu time
+
+    :param category: name of the category
+
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with timings_lock:
+            timings[category] += elapsed
+
+
+class StackSampler():
+
+    """
+
+    Samples the stacks of all the threads at a fixed interval and counts them in the collapsed format (frames separated by ';') used by flame graph tools
+
+    """
+
+    def __init__(self, interval=constants.PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        thread_names = {}
+        while not self.stopped.wait(self.interval):
+            for thread in threading.enumerate():
+                thread_names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.thread.ident:
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                frames.append(thread_names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(frames))] += 1
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def write(self, path):
+        with open(path, 'w') as fp:
+            for stack, count in self.stacks.most_common():
+                fp.write(f"{stack} {count}\n")
+
+
+def profiled(name):
+
+    """
+
+    The decorator profiles the decorated entry point when SEMVER_PROFILE is set, writing in SEMVER_PROFILE_DIR (profile/ by default):
+     - <name>.prof: cProfile stats of the calling thread, readable with pstats or snakeviz
+     - <name>.collapsed.txt: sampled stacks of all the threads, for flame graphs
+     - <name>.summary.json: wall time split into git subprocesses, http requests (and the wait for a request slot) and python cpu time, along with the top memory allocations
+
+    Nested profiled calls (e.g. Tags methods called from a profiled entry point) are part of the outermost profile
+
+    :param name: name of the profile files
+
+    """
+
+    def decorator(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not is_profiling_enabled() or not active_profile.acquire(blocking=False):
+                return function(*args, **kwargs)
+            try:
+                return run_profiled(name, function, *args, **kwargs)
+            finally:
+                active_profile.release()
+
+        return wrapper
+
+    return decorator
+
+
+def run_profiled(name, function, *args, **kwargs):
+
+    """
+
+    The function runs an entry point under cProfile, tracemalloc and the stack sampler, and writes the profile files
+
+    The git and http times are summed over all the threads, hence they can exceed the wall time when requests run concurrently
+
+    """
+
+    import cProfile
+    import tracemalloc
+
+    profile_dir = os.environ.get(constants.SEMVER_PROFILE_DIR, constants.PROFILE_DIR)
+    os.makedirs(profile_dir, exist_ok=True)
+    with timings_lock:
+        timings.clear()
+
+    profile = cProfile.Profile()
+    sampler = StackSampler()
+    tracemalloc.start()
+    sampler.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    profile.enable()
+    try:
+        return function(*args, **kwargs)
+    finally:
+        profile.disable()
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+        sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        profile.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+        sampler.write(os.path.join(profile_dir, f"{name}.collapsed.txt"))
+        with timings_lock:
+            summary = {
+                'wall_time': wall_time,
+                'python_cpu_time': cpu_time,
+                'git_time': timings['git'],
+                'http_time': timings['http'],
+                'http_queue_time': timings['http_queue'],
+                'peak_memory_bytes': peak_memory,
+                'top_allocations': [str(statistic) for statistic in snapshot.statistics('lineno')[:constants.PROFILE_TOP_ALLOCATIONS]],
+            }
+        with open(os.path.join(profile_dir, f"{name}.summary.json"), 'w') as fp:
+            json.dump(summary, fp, indent=2)
+        print(f"Profile of {name} saved in {profile_dir}: {json.dumps({key: value for key, value in summary.items() if key != 'top_allocations'})}")
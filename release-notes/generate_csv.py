@@ -1,9 +1,9 @@
 import csv
 import json
-
-
-test_report_json = open('test_report.json')
-test_report_dict = json.load(test_report_json)
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import profiling
 
 
 def flatten_test_report(test_report_dict):
@@ -16,12 +16,22 @@ def flatten_test_report(test_report_dict):
             flatened_test_report_list.append(test_case)
     return flatened_test_report_list
 
-flatened_test_report = flatten_test_report(test_report_dict)
 
-print(flatened_test_report[0].keys())
+@profiling.profiled('generate_csv')
+def main(test_report_json_path='test_report.json', test_report_csv_path='test_report.csv'):
+
+    with open(test_report_json_path) as test_report_json:
+        test_report_dict = json.load(test_report_json)
+
+    flatened_test_report = flatten_test_report(test_report_dict)
+
+    print(flatened_test_report[0].keys())
+
+    with open(test_report_csv_path, 'w') as f:
+        wr = csv.DictWriter(f, fieldnames = flatened_test_report[0].keys())
+        wr.writeheader()
+        wr.writerows(flatened_test_report)
 
-with open("test_report.csv", 'w') as f: 
-    wr = csv.DictWriter(f, fieldnames = flatened_test_report[0].keys())
-    wr.writeheader() 
-    wr.writerows(flatened_test_report)
 
+if __name__ == "__main__":
+    main()
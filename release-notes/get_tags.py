@@ -1,15 +1,90 @@
+import os
 import subprocess
+import sys
 import traceback
+from datetime import datetime
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import constants
+import profiling
+import release_notes_constants
 
 class Tags():
 
-    def fetch_all_tags(self):
+    def __init__(self, backend=None):
+        self.backend = backend or os.environ.get(constants.SEMVER_BACKEND, constants.SEMVER_BACKEND_GIT)
+
+    @profiling.profiled('fetch_all_tags')
+    def fetch_all_tags(self, pattern=None, remote='origin'):
+
+        """
+
+        The function fetches the tags from the remote repo
+        :param: pattern: pattern of the tags to be fetched, e.g. 'v[0-9]*' (None by default, in which case all the tags of all the remotes are fetched)
+        :param: remote: remote from which the tags matching the pattern are fetched
+        :return: number of refs and objects transferred when a pattern is given
+        :rtype: dict
+
+        """
+
+        if self.backend == constants.SEMVER_BACKEND_API:
+            print('Skipping the fetch of the tags as they are retrieved through the gitlab api')
+            return
         try:
+            if pattern is not None:
+                return self.fetch_tags(pattern, remote)
             self.git("fetch", "--all", "--tags").decode().strip()
         except:
             print('Oops !! An unhandled exception occured while fetching all the tags from the remote repo')
             traceback.print_exc()
 
+    def fetch_tags(self, pattern, remote='origin'):
+
+        """
+
+        The function fetches only the tags matching the pattern which are missing locally or point to a different object than on the remote
+        :param: pattern: pattern of the tags to be fetched, e.g. 'v[0-9]*'
+        :param: remote: remote from which the tags are fetched
+        :return: number of refs and objects transferred
+        :rtype: dict
+
+        """
+
+        tags_refs = f"refs/tags/{pattern}"
+        remote_tags = {}
+        for line in self.git("ls-remote", "--tags", remote, tags_refs).decode().strip().splitlines():
+            object_sha, tag_ref = line.split()
+            # peeled entries (refs/tags/v1.0.0^{}) describe the commit behind an annotated tag, the tag object is enough to compare
+            if not tag_ref.endswith('^{}'):
+                remote_tags[tag_ref] = object_sha
+        local_tags = dict(reversed(line.split()) for line in self.git("for-each-ref", "--format", "%(objectname) %(refname)", tags_refs).decode().strip().splitlines())
+
+        tags_to_fetch = sorted(tag_ref for tag_ref, object_sha in remote_tags.items() if local_tags.get(tag_ref) != object_sha)
+        if not tags_to_fetch:
+            print(f"All the {len(remote_tags)} tags matching {pattern} are already up to date")
+            return {'refs': 0, 'objects': 0}
+
+        objects_before = self.count_objects()
+        for i in range(0, len(tags_to_fetch), release_notes_constants.TAGS_FETCH_BATCH_SIZE):
+            refspecs = [f"+{tag_ref}:{tag_ref}" for tag_ref in tags_to_fetch[i:i+release_notes_constants.TAGS_FETCH_BATCH_SIZE]]
+            self.git("fetch", "--no-tags", remote, *refspecs)
+        fetch_summary = {'refs': len(tags_to_fetch), 'objects': self.count_objects() - objects_before}
+        print(f"Fetched {fetch_summary['refs']} of the {len(remote_tags)} tags matching {pattern}, {fetch_summary['objects']} objects transferred")
+        return fetch_summary
+
+    def count_objects(self):
+
+        """
+
+        The function counts the objects of the local repo, loose and packed
+        :return: number of objects
+        :rtype: int
+
+        """
+
+        count_objects = dict(line.split(': ') for line in self.git("count-objects", "-v").decode().strip().splitlines())
+        return int(count_objects['count']) + int(count_objects['in-pack'])
+
+    @profiling.profiled('get_tags_for_release_notes')
     def get_tags_for_release_notes(self, previous_tag, current_tag, pattern=None):
 
         """
@@ -33,9 +108,7 @@ class Tags():
                 print(f"No tags found between previous tag {previous_tag} and current tag {current_tag} as both the tags are same")
                 return
 
-            tags_refs = f"refs/tags/{pattern}" if pattern is not None else "refs/tags/"
-            tags = self.git("for-each-ref", "--sort", "creatordate", "--format", "%(tag)", tags_refs).decode().strip()
-            tags_list = tags.splitlines()
+            tags_list = self.get_tags_list(pattern)
             print('tags_list', tags_list)
             if tags_list:
                 if previous_tag not in tags_list:
@@ -59,6 +132,28 @@ class Tags():
             print('Oops !! An unhandled exception occured while getting the tags for release notes')
             traceback.print_exc()
 
+    def get_tags_list(self, pattern=None):
+
+        """
+
+        The function gets the names of the tags matching the pattern, sorted by their creation date, either from the local repo or through the gitlab api
+        :param: pattern: pattern correspnding to which the all the tags need to be retrieved (None by default)
+        :return: names of the tags
+        :rtype: list
+        """
+
+        if self.backend == constants.SEMVER_BACKEND_API:
+            import api_backend
+            tags = api_backend.get_tags(os.environ['CI_PROJECT_ID'], pattern, constants.PRIORITY_RELEASE_NOTES)
+            # annotated tags carry their own creation date, lightweight tags fall back to the date of their commit
+            tags.sort(key=lambda tag: datetime.fromisoformat(tag.get('created_at') or tag['commit']['created_at']))
+            return [tag['name'] for tag in tags]
+
+        tags_refs = f"refs/tags/{pattern}" if pattern is not None else "refs/tags/"
+        # the creation date only has a precision of one second, tags created within the same second are ordered by version
+        tags = self.git("for-each-ref", "--sort", "version:refname", "--sort", "creatordate", "--format", "%(tag)", tags_refs).decode().strip()
+        return tags.splitlines()
+
     def git(self, *args):
 
         """
@@ -70,11 +165,12 @@ class Tags():
         
         """
         
-        return subprocess.check_output(["git"] + list(args))
+        with profiling.timed('git'):
+            return subprocess.check_output(["git"] + list(args))
 
 
 
 if __name__ == "__main__":
     tags = Tags()
-    tags.fetch_all_tags()
+    tags.fetch_all_tags('v[0-9]*')
     tags.get_tags_for_release_notes('v0.0.1', 'v1.0.0', 'v[0-9]*')
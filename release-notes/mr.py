@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import os
+import sys
 import requests
 import traceback
-import release_notes_constants
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import constants
+import gitlab_scheduler
 
 
 class Mr():
@@ -22,11 +25,9 @@ class Mr():
         """
 
         try:
-            endpoint = f"{release_notes_constants.GITLAB_BASE_ENDPOINT}/projects/{self.gitlab_env_vars['CI_PROJECT_ID']}/repository/commits/{self.gitlab_env_vars['CI_COMMIT_SHORT_SHA']}/merge_requests"
+            endpoint = f"{constants.BASE_ENDPOINT}/projects/{self.gitlab_env_vars['CI_PROJECT_ID']}/repository/commits/{self.gitlab_env_vars['CI_COMMIT_SHORT_SHA']}/merge_requests"
             print(f"Getting the list of all the merge requests corresponding to the given commit, endpoint is: {endpoint}")
-            commit_mrs = requests.get(endpoint, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
-            commit_mrs.raise_for_status()
-            commit_mrs = commit_mrs.json()
+            commit_mrs = gitlab_scheduler.get_json(endpoint, priority=constants.PRIORITY_RELEASE_NOTES, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
             return commit_mrs
         except requests.exceptions.HTTPError:
             print('Oops !! An HTTP error occurred while getting the merge requests of a commit')
@@ -64,3 +65,28 @@ class Mr():
         except:
             print("Oops !! An unhandled error occurred while fetching the merge request corresponding to the target branch")
             traceback.print_exc()
+
+    def get_mr(self, mr_iid):
+
+        """
+
+        The function gets a merge request through gitlab's merge requests api
+        :param mr_iid: merge request iid
+        :return: merge request
+        :rtype: dict
+
+        """
+
+        try:
+            endpoint = f"{constants.BASE_ENDPOINT}/projects/{self.gitlab_env_vars['CI_PROJECT_ID']}/merge_requests/{mr_iid}"
+            print(f"Getting the merge request {mr_iid}, endpoint is: {endpoint}")
+            return gitlab_scheduler.get_json(endpoint, priority=constants.PRIORITY_RELEASE_NOTES, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
+        except requests.exceptions.HTTPError:
+            print(f"Oops !! An HTTP error occurred while getting the merge request {mr_iid}")
+            traceback.print_exc()
+        except KeyError:
+            print(f"Oops !! A key error occurred while getting the merge request {mr_iid}")
+            traceback.print_exc()
+        except:
+            print(f"Oops !! An unhandled error occurred while getting the merge request {mr_iid}")
+            traceback.print_exc()
@@ -1,51 +1,46 @@
 #!/usr/bin/env python3
 import json
+import os
+import sys
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from mr import Mr
 from mr_template import MrTemplate
 from mr_jira_ids import MrJiraIds
+import release_notes_constants
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import profiling
 
 
 class MrInfo(Mr):
 
     def __init__(self):
         super().__init__()
+        self.mr_template = MrTemplate()
+        self.mr_jira_ids = MrJiraIds(self.gitlab_env_vars)
 
+    @profiling.profiled('mr_info')
     def get_mr_info(self):
 
         """
 
         The functions peforms the following steps:
         - Gets the merge request corresponding to a commit
-        - Gets the content of the merge request template
-        - Extracts the Jira Ids from commit messages of the respective merge request
+        - Gets the content of the merge request template and extracts the Jira Ids from commit messages of the respective merge request, concurrently
         - Cosolidates the template and jira id info and saves them in a json file
 
         """
 
         try:
-            
+
             commit_mrs = self.get_commit_mrs()
             if commit_mrs:
                 mr_for_target_branch = self.get_mr_for_target_branch(commit_mrs)
                 if mr_for_target_branch:
-                    mr_template = MrTemplate()
-                    mr_template_dict = mr_template.get_mr_template_dict(mr_for_target_branch, self.gitlab_env_vars['MERGE_REQUEST_HEADER_TEXT'])
-                    if mr_template_dict:
-                        mr_jira_ids = MrJiraIds(self.gitlab_env_vars)
-                        mr_jira_ids_list = mr_jira_ids.get_jira_ids_list(mr_for_target_branch)
-                        if mr_jira_ids_list:
-                            mr_info_dict = {'mr_iid': mr_for_target_branch['iid'], 'template': mr_template_dict, 'jira_ids': mr_jira_ids_list}
-                            mr_info_json = json.dumps(mr_info_dict, indent=2)
-                            print('mr_info_json: ', mr_info_json)
-                            mr_info_json_file = open('mr_info.json', 'w')
-                            mr_info_json_file.write(mr_info_json)
-                            mr_info_json_file.close()
-                            return 0
-                        else:
-                            print('Getting merge request info skipped as no merge request jira ids found for the corresponding commit messages')
-                    else:
-                        print('Getting merge request info skipped as either the mr template could not be retrieved or there were no impacted components for the merge request')
+                    mr_info_dict = self.get_mr_info_dict(mr_for_target_branch)
+                    if mr_info_dict:
+                        self.save_mr_info(mr_info_dict)
+                        return 0
                 else:
                     print(f"Getting merge request info skipped as no merge request could be retrieved against the corresponding target branch {self.gitlab_env_vars['CI_COMMIT_BRANCH']}")
             else:
@@ -56,8 +51,65 @@ class MrInfo(Mr):
         except:
             print("Oops !! An unhandled exception occured while getting the mr info")
             traceback.print_exc()
-            
+
+    def get_mr_info_dict(self, mr):
+
+        """
+
+        The function parses the template of a merge request while its commit pages are fetched, and merges both into the mr info
+        :param: mr: merge request
+        :return: merge request iid, template and jira ids, None if either the template or the jira ids could not be retrieved
+        :rtype: dict
+
+        """
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            mr_jira_ids_future = executor.submit(self.mr_jira_ids.get_jira_ids_list, mr)
+            mr_template_dict = self.mr_template.get_mr_template_dict(mr, self.gitlab_env_vars['MERGE_REQUEST_HEADER_TEXT'])
+            mr_jira_ids_list = mr_jira_ids_future.result()
+
+        if not mr_template_dict:
+            print('Getting merge request info skipped as either the mr template could not be retrieved or there were no impacted components for the merge request')
+        elif not mr_jira_ids_list:
+            print('Getting merge request info skipped as no merge request jira ids found for the corresponding commit messages')
+        else:
+            return {'mr_iid': mr['iid'], 'template': mr_template_dict, 'jira_ids': mr_jira_ids_list}
+
+    def get_mr_infos(self, mr_iids, max_workers=release_notes_constants.MR_INFO_WORKERS):
+
+        """
+
+        The function gets the mr info of many merge requests concurrently
+        :param: mr_iids: merge request iids
+        :param: max_workers: number of merge requests processed concurrently
+        :return: mr info of the merge requests for which it could be retrieved, in the order of mr_iids
+        :rtype: list
+
+        """
+
+        def get_mr_info_for_iid(mr_iid):
+            try:
+                mr = self.get_mr(mr_iid)
+                if mr:
+                    return self.get_mr_info_dict(mr)
+            except:
+                print(f"Oops !! An unhandled exception occured while getting the mr info of merge request {mr_iid}")
+                traceback.print_exc()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return [mr_info_dict for mr_info_dict in executor.map(get_mr_info_for_iid, mr_iids) if mr_info_dict]
+
+    def save_mr_info(self, mr_info):
+        mr_info_json = json.dumps(mr_info, indent=2)
+        print('mr_info_json: ', mr_info_json)
+        with open('mr_info.json', 'w') as mr_info_json_file:
+            mr_info_json_file.write(mr_info_json)
+
 
 if __name__ == "__main__":
     mr_info = MrInfo()
-    mr_info.get_mr_info()
+    if len(sys.argv) > 1:
+        # merge request iids given on the command line are processed together and saved as a list
+        mr_info.save_mr_info(mr_info.get_mr_infos(sys.argv[1:]))
+    else:
+        mr_info.get_mr_info()
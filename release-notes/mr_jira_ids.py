@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
+import os
+import sys
 import requests
 import re
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 import release_notes_constants
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import constants
+import gitlab_scheduler
 
 
 class MrJiraIds():
@@ -56,18 +62,19 @@ class MrJiraIds():
         try:
             all_mr_commits = []
 
-            endpoint = f"{release_notes_constants.GITLAB_BASE_ENDPOINT}/projects/{self.gitlab_env_vars['CI_PROJECT_ID']}/merge_requests/{mr_iid}/commits?per_page={release_notes_constants.MR_COMMITS_PER_PAGE}"
+            endpoint = f"{constants.BASE_ENDPOINT}/projects/{self.gitlab_env_vars['CI_PROJECT_ID']}/merge_requests/{mr_iid}/commits?per_page={release_notes_constants.MR_COMMITS_PER_PAGE}"
             print(f"Getting all the commits of a merge request, endpoint is: {endpoint}")
-            mr_commits_current_page = requests.get(endpoint, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
+            mr_commits_current_page = gitlab_scheduler.get(endpoint, priority=constants.PRIORITY_RELEASE_NOTES, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
             mr_commits_current_page.raise_for_status()
             mr_commits_current_page_headers = mr_commits_current_page.headers
             mr_commits_current_page = mr_commits_current_page.json()
             all_mr_commits.extend(mr_commits_current_page)
             total_pages = int(mr_commits_current_page_headers['X-Total-Pages'])
 
-            for i in range(2, total_pages+1):
-                next_page_mr_commits = self.get_next_page_mr_commits(endpoint, i)
-                all_mr_commits.extend(next_page_mr_commits)            
+            # the remaining pages are fetched concurrently, map keeps them in page order
+            with ThreadPoolExecutor(max_workers=release_notes_constants.MR_INFO_WORKERS) as executor:
+                for next_page_mr_commits in executor.map(lambda page: self.get_next_page_mr_commits(endpoint, page), range(2, total_pages+1)):
+                    all_mr_commits.extend(next_page_mr_commits)
 
             return all_mr_commits
         except requests.exceptions.HTTPError:
@@ -81,7 +88,7 @@ class MrJiraIds():
     def get_next_page_mr_commits(self, endpoint, page):
         try:
             next_page_endpoint = f"{endpoint}&page={page}"
-            next_page_mr_commits  = requests.get(next_page_endpoint, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
+            next_page_mr_commits  = gitlab_scheduler.get(next_page_endpoint, priority=constants.PRIORITY_RELEASE_NOTES, headers = {"PRIVATE-TOKEN": self.gitlab_env_vars['GITLAB_TOKEN']})
             next_page_mr_commits.raise_for_status()
             next_page_mr_commits = next_page_mr_commits.json()
             return next_page_mr_commits
@@ -69,9 +69,10 @@ class MrTemplate():
 
             for text in range(header_text_index, len(mr_template)):
                 mr_template[text] = mr_template[text].strip()
-                if mr_template[text].startswith(release_notes_constants.ENABLED_CHECKBOX_MARKDOWN):
-                    checkbox_text = mr_template[text].split(release_notes_constants.ENABLED_CHECKBOX_MARKDOWN)
-                    mr_template_dict["impacted_components"].append(checkbox_text[1].strip())
+                # gitlab keeps the checked boxes as typed, hence '- [X]' is as checked as '- [x]'
+                if mr_template[text].lower().startswith(release_notes_constants.ENABLED_CHECKBOX_MARKDOWN):
+                    checkbox_text = mr_template[text][len(release_notes_constants.ENABLED_CHECKBOX_MARKDOWN):]
+                    mr_template_dict["impacted_components"].append(checkbox_text.strip())
                 elif mr_template[text].startswith(release_notes_constants.DISABLED_CHECKBOX_MARKDOWN):
                     checkbox_text = mr_template[text].split(release_notes_constants.DISABLED_CHECKBOX_MARKDOWN)
                     mr_template_dict["non_impacted_components"].append(checkbox_text[1].strip())
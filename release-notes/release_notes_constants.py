@@ -1,3 +1,5 @@
-GITLAB_BASE_ENDPOINT= 'https://gitlab.com/api/v4'
 ENABLED_CHECKBOX_MARKDOWN = '- [x]'
-DISABLED_CHECKBOX_MARKDOWN = '- [ ]'
\ No newline at end of file
+DISABLED_CHECKBOX_MARKDOWN = '- [ ]'
+MR_COMMITS_PER_PAGE = 100
+MR_INFO_WORKERS = 8
+TAGS_FETCH_BATCH_SIZE = 500
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import constants
+
+
+class RequestCoalescer():
+
+    """
+
+    Singleflight and memoization of identical requests within a process:
+     - Concurrent callers of the same key share a single in-flight call
+     - Results are kept for ttl seconds in a bounded cache, evicting the least recently used entry first
+     - Failed calls are not cached, every caller waiting on them gets the exception
+
+    The results are shared between the callers, hence they must not be mutated
+
+    """
+
+    def __init__(self, ttl=constants.REQUEST_CACHE_TTL, max_entries=constants.REQUEST_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get(self, key, fetch):
+
+        """
+
+        The function returns the cached result of a key, waits for the in-flight call of the key or calls fetch
+
+        :param key: hashable identity of the request
+        :param fetch: function performing the request
+        :return: result of fetch
+        :rtype: object
+
+        """
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, result = entry
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self.entries[key]
+
+            call = self.in_flight.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self.in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not is_leader:
+            return call.result()
+
+        try:
+            result = fetch()
+        except BaseException as exception:
+            with self.lock:
+                del self.in_flight[key]
+            call.set_exception(exception)
+            raise
+
+        with self.lock:
+            del self.in_flight[key]
+            self.entries[key] = (time.monotonic() + self.ttl, result)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        call.set_result(result)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+
+        """
+
+        :return: number of cache hits, misses and calls coalesced into an in-flight call, along with the cache size
+        :rtype: dict
+
+        """
+
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced, 'entries': len(self.entries)}
@@ -1,14 +1,15 @@
 #!/usr/bin/env python3
 import os
 import sys
-import semver
 import subprocess
-import requests
 import re
 
-import auto_semver_tag_constants
+import bump_ledger
+import constants
+import gitlab_scheduler
+import profiling
 
-def get_commit_tag():
+def get_commit_tag(revision="HEAD", repo_dir=None):
 
     """
 
@@ -24,14 +25,16 @@ def get_commit_tag():
     and the abbreviated SHA of the most recent commit
     Example: 1.2.3-7-g1282be01 (Here 7 indicates the number of additional commits and g1282be01 indicates the abbreviated SHA)
 
+    :param revision: commit from which the tag must be reachable, HEAD by default
+    :param repo_dir: repository in which the tag is looked up, the current directory if None
     :return: Returns the most recent tag reachable from a commit & matching the glob pattern, otherwise 0.0.0
     :rtype: str
     
     """
     try:
         # Get the most recent tag with the specified prefix, reachable from a commit
-        glob = f"{auto_semver_tag_constants.PREFIX}[0-9]*"
-        commit_tag = git("describe", "--tags", "--match", glob).decode().strip()
+        glob = f"{constants.PREFIX}[0-9]*"
+        commit_tag = git("describe", "--tags", "--match", glob, revision, repo_dir=repo_dir).decode().strip()
         print(f'most recent tag reachable from a commit is: {commit_tag}')
         return commit_tag
 
@@ -41,18 +44,20 @@ def get_commit_tag():
         commit_tag = "0.0.0"
         return commit_tag
 
-def git(*args):
+def git(*args, repo_dir=None):
 
     """
     The function takes in git arguments and executes them
 
     :param args: git command arguments
+    :param repo_dir: repository in which the command is executed, the current directory if None
     :return: Returns the output of git commands
     :rtype: str
     
     """
     
-    return subprocess.check_output(["git"] + list(args))
+    with profiling.timed('git'):
+        return subprocess.check_output(["git"] + list(args), cwd=repo_dir)
 
 def is_tag_bumping_required(commit_tag):
 
@@ -65,7 +70,7 @@ def is_tag_bumping_required(commit_tag):
     
     """
     
-    commit_tag_without_prefix = remove_prefix(auto_semver_tag_constants.PREFIX, commit_tag)
+    commit_tag_without_prefix = remove_prefix(constants.PREFIX, commit_tag)
 
     # If commit_tag ends with an abbreviated comit SHA (starting with a g), it implies that there are additional commits and those commits are not tagged yet (example tag name: 1.2.3-7-g1282be01)
     # Whereas if commit_tag doesn't end with an abbreviated commit SHA, it implies that the tag is already pointing to the current HEAD (example tag name: 1.2.3)
@@ -134,48 +139,57 @@ def is_tag_semver(commit_tag):
     res = re.search("^(?P<major>0|[1-9]\d*)\.(?P<minor>0|[1-9]\d*)\.(?P<patch>0|[1-9]\d*)(?:-(?P<prerelease>(?:0|[1-9]\d*|\d*[a-zA-Z-][0-9a-zA-Z-]*)(?:\.(?:0|[1-9]\d*|\d*[a-zA-Z-][0-9a-zA-Z-]*))*))?(?:\+(?P<buildmetadata>[0-9a-zA-Z-]+(?:\.[0-9a-zA-Z-]+)*))?$", commit_tag)
     return res
 
-def get_commit_tag_without_sha(commit_tag):
+def get_commit_tag_without_sha(commit_tag, revision="HEAD", repo_dir=None):
 
     """
 
     The function retrieves the most recent tag reachable from a commit and matching the glob pattern, without the abbreviated commit SHA
 
+    :param revision: commit from which the tag must be reachable, HEAD by default
+    :param repo_dir: repository in which the tag is looked up, the current directory if None
     :return: Returns the commit tag matching the glob pattern, without the abbreviated commit SHA
     :rtype: str
     
     """
     try:
-        glob = f"{auto_semver_tag_constants.PREFIX}[0-9]*"
-        commit_tag_without_sha = git("describe", "--tags", "--match", glob, "--abbrev=0").decode().strip()
+        glob = f"{constants.PREFIX}[0-9]*"
+        commit_tag_without_sha = git("describe", "--tags", "--match", glob, "--abbrev=0", revision, repo_dir=repo_dir).decode().strip()
         print(f'commit_tag_without_sha: {commit_tag_without_sha}')
         return commit_tag_without_sha
     except subprocess.CalledProcessError:
         raise Exception('Exception occurred while retrieving sha of the most recent commit tag')
 
-def get_commits_since_last_tag(commit_tag_without_sha):
+def get_commits_since_last_tag(commit_tag_without_sha, revision="HEAD", repo_dir=None):
 
     """
 
     The function fetches all the commits since the last commit tag
 
     :param commit_tag_without_sha: Most recent commit tag reachable from a commit without its associated abbreviated commit SHA
-    :return: Returns all the commits since the last commit tag
+    :param revision: commit up to which the commits are listed, HEAD by default
+    :param repo_dir: repository in which the commits are listed, the current directory if None
+    :return: Returns the full SHAs of all the commits since the last commit tag
     :rtype: str
     
     """
-    commits_since_last_tag = git("log", "--first-parent", "--pretty=%h", f"{commit_tag_without_sha}..HEAD").decode().strip()
+    # full SHAs, like the api backend and the CI_COMMIT_SHA of the pipeline, so that the lookups of a commit share the request cache
+    commits_since_last_tag = git("log", "--first-parent", "--pretty=%H", f"{commit_tag_without_sha}..{revision}", repo_dir=repo_dir).decode().strip()
     print(f"commits_since_last_tag: {commits_since_last_tag}")
     return commits_since_last_tag
 
-def get_bump_tag_info(commit_tag_without_sha, commits_since_last_tag):
+def get_bump_tag_info(commit_tag_without_sha, commits_since_last_tag, head_sha=None, repo_dir=None, ledger_path=constants.BUMP_LEDGER_FILE):
 
     """
     
-    The function iterates through all the commits available after the most recent commit tag and works out the tag version to be bumped and its corresponding message
+    The function classifies all the commits available after the most recent commit tag by their merge request label, folds the bumps into the tag version
+    and keeps the reasoning in a bump ledger, saved in bump_ledger.json and rendered as the tag message
 
 
     :param commit_tag_without_sha: Most recent commit tag reachable from a commit without its associated abbreviated commit SHA
     :param commits_since_last_tag: All the commits since the last commit tag
+    :param head_sha: commit SHA used when there are no commits since the last tag, HEAD of the local repo if None
+    :param repo_dir: local repo, the current directory if None
+    :param ledger_path: file in which the bump ledger is saved
     :return: Returns the commit SHA of the most recent commit
     :rtype: str
     :return: Returns the tag version based on semver bumping
@@ -186,94 +200,130 @@ def get_bump_tag_info(commit_tag_without_sha, commits_since_last_tag):
     """
 
     if not commits_since_last_tag:
-        commit_sha = git("rev-parse", "--short", "HEAD").decode().strip()
-        bump_tag_version, bump_tag_message = get_bump_tag_version_and_message(commit_sha, commit_tag_without_sha)
-
+        list_commits_since_last_tag = [head_sha or git("rev-parse", "HEAD", repo_dir=repo_dir).decode().strip()]
     else:
-        list_commits_since_last_tag = []
-        commit_tag_without_prefix = remove_prefix(auto_semver_tag_constants.PREFIX, commit_tag_without_sha)
         list_commits_since_last_tag = commits_since_last_tag.splitlines()
         list_commits_since_last_tag.reverse()
 
-        for line in list_commits_since_last_tag:
-            commit_sha = line
-            bump_tag_version, bump_tag_message = get_bump_tag_version_and_message(commit_sha, commit_tag_without_prefix)
+    commit_tag_without_prefix = remove_prefix(constants.PREFIX, commit_tag_without_sha)
+    ledger = bump_ledger.build_ledger(commit_tag_without_prefix, list_commits_since_last_tag, extract_merge_request)
+    bump_ledger.save_ledger(ledger, ledger_path)
 
+    commit_sha = ledger[-1]['commit']
+    bump_tag_version = ledger[-1]['version']
+    bump_tag_message = bump_ledger.get_tag_message(ledger)
     print(f"commit_sha: {commit_sha}")
-    print(f"bump_tag_version: {auto_semver_tag_constants.PREFIX}{bump_tag_version}")
+    print(f"bump_tag_version: {bump_tag_version}")
     print (f"bump_tag_message: {bump_tag_message}")
-    return commit_sha, f"{auto_semver_tag_constants.PREFIX}{bump_tag_version}", bump_tag_message
+    return commit_sha, bump_tag_version, bump_tag_message
 
-def get_bump_tag_version_and_message(commit_sha, bump_tag_version):
+def extract_merge_request(commit_sha):
 
     """
-    
-    The function retrieves the bump tag version and message based on the merge request label(s) and title 
+    The function fetches the most recent merge request corresponding to a commit
 
-    :param commit_sha: commit SHA of the most recent commit
-    :param bump_tag_version: initial tag version based on which bumped semver tag is retrieved
-    :return: Returns the semver version of the tag based on the initial tag version
-    :rtype: str
-    :return: Returns the tag message which is the merge request title
+    :param commit_sha: commit SHA
+    :return: Returns the merge request or None if the commit doesn't belong to any
+    :rtype: dict or None
     
     """
 
-    merge_request_labels, merge_request_title = extract_merge_request_info(commit_sha)
-    bump_tag_message = merge_request_title
-    
-    if auto_semver_tag_constants.VERSION_MAJOR in merge_request_labels:
-        bump_tag_version = semver.bump_major(bump_tag_version)
-    elif auto_semver_tag_constants.VERSION_MINOR in merge_request_labels:
-        bump_tag_version = semver.bump_minor(bump_tag_version)
-    else:
-        bump_tag_version = semver.bump_patch(bump_tag_version)
-    return bump_tag_version, bump_tag_message
-
+    project_id = os.environ["CI_PROJECT_ID"]
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/commits/{commit_sha}/merge_requests"
+    print(f"Getting the list of all the merge requests corresponding to the given commit, endpoint is: {endpoint}")
+    merge_requests = gitlab_scheduler.get_json(endpoint, priority=constants.PRIORITY_TAGGING, headers = gitlab_scheduler.get_headers())
+    if not merge_requests:
+        print(f'No merge request found for the commit {commit_sha}')
+        return None
+    return merge_requests[0]
 
-def extract_merge_request_info(commit_sha):
+def tag_commit(bump_tag_version, commit_sha, bump_tag_message):
 
     """
-    The function fetches the merge request information corresponding to a commit
+    The function associates a tag to a commit through its sha and pushes it to the remote repo
 
-    :param commit_sha: commit SHA of the most recent commit
-    :return merge_request_labels: Returns the label(s) assigned to a Merge Request
-    :rtype: list
-    :return: Title of the Merge Request
-    :rtype: str
+    :param bump_tag_version: Name of the annoatated tag (with the specified prefix) that needs to be pushed
+    :param commit_sha: commit sha with which the annotated tag needs to be associated
+    :param bump_tag_message: Message for the annotated tag
+    :return: tag creation api response
+    :rtype: object
     
     """
 
     project_id = os.environ["CI_PROJECT_ID"]
-    endpoint = f"{auto_semver_tag_constants.GITLAB_BASE_ENDPOINT}/projects/{project_id}/repository/commits/{commit_sha}/merge_requests"
-    print(f"Getting the list of all the merge requests corresponding to the given commit, endpoint is: {endpoint}")
-    merge_requests_response = requests.get(endpoint, headers = {"PRIVATE-TOKEN": os.environ.get(auto_semver_tag_constants.CI_PRIVATE_TOKEN)})
-    merge_request_labels = merge_requests_response.json()[0]['labels']
-    print(f'Label(s) available for the most recent merge request: {merge_request_labels}')
-    merge_request_title = merge_requests_response.json()[0]['title']
-    print(f'Title of the most recent merge request: {merge_request_title}')
+    endpoint = f'{constants.BASE_ENDPOINT}/projects/{project_id}/repository/tags'
+    print(f'Pushing the tag {bump_tag_version} for the commit {commit_sha} to the remote repository, endpoint is: {endpoint}')
+    # the tag message spans several lines, hence it is sent in the request body rather than the query string
+    tags_response = gitlab_scheduler.post(endpoint, priority=constants.PRIORITY_TAGGING, headers = gitlab_scheduler.get_headers(), data = {"tag_name": bump_tag_version, "ref": commit_sha, "message": bump_tag_message})
+    return tags_response.json()
 
-    return merge_request_labels, merge_request_title
+def is_tag_conflict(tag_commit_response):
 
-def tag_commit(bump_tag_version, commit_sha, bump_tag_message):
+    """
+    The function checks if the tag creation failed because a tag with the same name already exists
 
+    :param tag_commit_response: tag creation api response
+    :return: Returns True if the tag already exists
+    :rtype: bool
+    
     """
-    The function associates a tag to a commit through its sha and pushes it to the remote repo
+
+    return 'name' not in tag_commit_response and 'already exists' in str(tag_commit_response.get('message'))
+
+def tag_commit_optimistically(bump_tag_version, commit_sha, bump_tag_message, max_attempts=constants.TAG_MAX_ATTEMPTS, ledger_path=constants.BUMP_LEDGER_FILE):
+
+    """
+    The function pushes the tag without any lock between the pipelines and resolves the conflicts with the pipelines tagging concurrently
+
+    If the tag already exists:
+     - on the commit itself, another pipeline already tagged it and there is nothing left to do
+     - on a descendant of the commit, a later pipeline already tagged it, its version covers the commit and the tagging is skipped
+     - on an ancestor of the commit, a concurrent pipeline tagged an earlier commit with the same version,
+       hence the version is recomputed from the freshly created tag and the push is retried
 
     :param bump_tag_version: Name of the annoatated tag (with the specified prefix) that needs to be pushed
     :param commit_sha: commit sha with which the annotated tag needs to be associated
     :param bump_tag_message: Message for the annotated tag
-    :return: tag creation api response
+    :param max_attempts: maximum number of pushes
+    :param ledger_path: file in which the bump ledger of a recomputed version is saved
+    :return: tag creation api response, or the existing tag if the commit or a descendant is already tagged
     :rtype: object
     
     """
 
+    import api_backend
     project_id = os.environ["CI_PROJECT_ID"]
-    endpoint = f'{auto_semver_tag_constants.GITLAB_BASE_ENDPOINT}/projects/{project_id}/repository/tags?tag_name={bump_tag_version}&ref={commit_sha}&message={bump_tag_message}'
-    print(f'Pushing the commit to the remote repository, endpoint is: {endpoint}')
-    tags_response = requests.post(endpoint, headers = {"PRIVATE-TOKEN": os.environ.get(auto_semver_tag_constants.CI_PRIVATE_TOKEN)})
-    return tags_response.json()
-
-def main():
+    for attempt in range(1, max_attempts + 1):
+        tag_commit_response = tag_commit(bump_tag_version, commit_sha, bump_tag_message)
+        if not is_tag_conflict(tag_commit_response):
+            return tag_commit_response
+
+        existing_tag = api_backend.get_tag(project_id, bump_tag_version)
+        if existing_tag is None:
+            # the conflicting tag got deleted in the meantime, the same version can be pushed again
+            print(f'The tag {bump_tag_version} does not exist anymore, retrying the push')
+            continue
+        # the commit may be given as an abbreviated SHA
+        head_sha = api_backend.get_commit(project_id, commit_sha)['id']
+        existing_sha = existing_tag['commit']['id']
+        if existing_sha == head_sha:
+            print(f'Skipping the push as the commit {commit_sha} has already been tagged as {bump_tag_version} by a concurrent pipeline')
+            return existing_tag
+        if api_backend.is_ancestor(project_id, head_sha, existing_sha):
+            print(f'Skipping the push as the descendant commit {existing_sha} has already been tagged as {bump_tag_version} by a later pipeline')
+            return existing_tag
+        if not api_backend.is_ancestor(project_id, existing_sha, head_sha):
+            print(f'The tag {bump_tag_version} already exists on the commit {existing_sha} which is not in the history of {commit_sha}')
+            return tag_commit_response
+
+        print(f'The tag {bump_tag_version} has been created concurrently on the ancestor commit {existing_sha}, recomputing the version from it (attempt {attempt} of {max_attempts})')
+        commits_since_last_tag = api_backend.get_commits_since_last_tag(project_id, existing_tag, head_sha)
+        commit_sha, bump_tag_version, bump_tag_message = get_bump_tag_info(existing_tag['name'], commits_since_last_tag, head_sha, ledger_path=ledger_path)
+
+    print(f'Giving up on tagging the commit {commit_sha} after {max_attempts} conflicting attempts')
+    return tag_commit_response
+
+def compute_bump_tag(head_sha=None, repo_dir=None, ledger_path=constants.BUMP_LEDGER_FILE):
 
     """
 
@@ -284,36 +334,73 @@ def main():
      - Gets the abbreviated commit SHA releated to the most recent commit tag
      - Gets all the commits since the last tag
      - Iterates through all the commits and works out the tag version to be bumped and its corresponding message
+
+    With SEMVER_BACKEND=api the last tag and the commits since then are retrieved through the gitlab api instead of the local git history
+
+    :param head_sha: commit to be tagged, by default HEAD of the local repo or with SEMVER_BACKEND=api the commit of the pipeline (CI_COMMIT_SHA)
+    :param repo_dir: local repo, the current directory if None
+    :param ledger_path: file in which the bump ledger is saved
+    :return: Returns the commit SHA, bump tag version and bump tag message or None if bumping is not required
+    :rtype: tuple or None
+
+    """
+
+    if os.environ.get(constants.SEMVER_BACKEND, constants.SEMVER_BACKEND_GIT) == constants.SEMVER_BACKEND_API:
+        # work out the last tag and the commits since then through the gitlab api, without any local git history
+        import api_backend
+        head_sha = head_sha or os.environ['CI_COMMIT_SHA']
+        last_tag = api_backend.get_last_tag(os.environ['CI_PROJECT_ID'], head_sha)
+        if last_tag is None:
+            return get_bump_tag_info('0.0.0', None, head_sha, ledger_path=ledger_path)
+        if last_tag['commit']['id'] == head_sha:
+            print(f"Skipping version bumping as the most recent tag: {last_tag['name']} is already pointing to the latest commit")
+            return
+        commits_since_last_tag = api_backend.get_commits_since_last_tag(os.environ['CI_PROJECT_ID'], last_tag, head_sha)
+        return get_bump_tag_info(last_tag['name'], commits_since_last_tag, head_sha, ledger_path=ledger_path)
+
+    # get the most recent tag reachable from a commit
+    revision = head_sha or "HEAD"
+    commit_tag = get_commit_tag(revision, repo_dir)
+    # assign 0.0.0 version to no commit_tag if no tag is found
+    if commit_tag == '0.0.0':
+        is_bumping_required = True
+    else:
+        # check if bumping of tag is required by validating if the last tag is reachable from a commit and is following semver scheme or not
+        is_bumping_required = is_tag_bumping_required(commit_tag)
+        
+    # perform version bumping if all tag validation checks pass
+    if is_bumping_required:
+        if commit_tag == '0.0.0':
+            commit_tag_without_sha = commit_tag
+            commits_since_last_tag = None
+        else:
+            # get the most recent tag reachable from a commit without the commit SHA
+            commit_tag_without_sha = get_commit_tag_without_sha(commit_tag, revision, repo_dir)
+            # get all the commits since last tag
+            commits_since_last_tag = get_commits_since_last_tag(commit_tag_without_sha, revision, repo_dir)
+        # iterate through all the commits and work out the tag version to be bumped and its corresponding message
+        return get_bump_tag_info(commit_tag_without_sha, commits_since_last_tag, head_sha, repo_dir, ledger_path)
+
+@profiling.profiled('tag')
+def main():
+
+    """
+
+    The functions pefroms the following steps:
+     - Works out the tag version to be bumped and its corresponding message (see compute_bump_tag)
      - Pushes an annotated tag to the remote repo with the retrieved bump version and tag message
 
     """
 
     try:
 
-        # get the most recent tag reachable from a commit
-        commit_tag = get_commit_tag()
-        # assign 0.0.0 version to no commit_tag if no tag is found
-        if commit_tag == '0.0.0':
-            is_bumping_required = True
-        else:
-            # check if bumping of tag is required by validating if the last tag is reachable from a commit and is following semver scheme or not
-            is_bumping_required = is_tag_bumping_required(commit_tag)
-            
-        # perform version bumping if all tag validation checks pass
-        if is_bumping_required:
-            if commit_tag == '0.0.0':
-                commit_tag_without_sha = commit_tag
-                commits_since_last_tag = None
-            else:
-                # get the most recent tag reachable from a commit without the commit SHA
-                commit_tag_without_sha = get_commit_tag_without_sha(commit_tag)
-                # get all the commits since last tag
-                commits_since_last_tag = get_commits_since_last_tag(commit_tag_without_sha)
-            # iterate through all the commits and work out the tag version to be bumped and its corresponding message
-            commit_sha, bump_tag_version, bump_tag_message = get_bump_tag_info(commit_tag_without_sha, commits_since_last_tag)
+        bump_tag = compute_bump_tag()
+        if bump_tag:
+            commit_sha, bump_tag_version, bump_tag_message = bump_tag
             # commit the tag to the remote repo
-            tag_commit_response = tag_commit(bump_tag_version, commit_sha, bump_tag_message)
+            tag_commit_response = tag_commit_optimistically(bump_tag_version, commit_sha, bump_tag_message)
             print(f'Tag commit response is: {tag_commit_response}')
+            print(f'Request cache stats: {gitlab_scheduler.request_cache.stats()}')
             return 0
     except RuntimeError as re:
         print('Oops!! An exception occurred while semver tagging!')
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import sys
+import traceback
+
+import api_backend
+import bump_ledger
+import constants
+import gitlab_scheduler
+
+
+def create_version_plan(project_id, mr_iid):
+
+    """
+
+    The function predicts, while the merge request pipeline runs, the tag the merge of the merge request will get on its target branch
+
+    The plan is keyed by the merge request and the commit the merge commit is expected to have as first parent, i.e. the current tip of the target branch
+
+    :param project_id: gitlab project id
+    :param mr_iid: merge request iid
+    :return: version plan
+    :rtype: dict
+
+    """
+
+    mr = gitlab_scheduler.get_json(f"{constants.BASE_ENDPOINT}/projects/{project_id}/merge_requests/{mr_iid}", priority=constants.PRIORITY_TAGGING, headers=api_backend.get_headers())
+    target_branch = gitlab_scheduler.get_json(f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/branches/{mr['target_branch']}", priority=constants.PRIORITY_TAGGING, headers=api_backend.get_headers())
+    base_commit = target_branch['commit']['id']
+
+    last_tag = api_backend.get_last_tag(project_id, base_commit)
+    base_version = last_tag['name'][len(constants.PREFIX):] if last_tag else '0.0.0'
+    if last_tag and last_tag['commit']['id'] != base_commit:
+        print(f"The tip of {mr['target_branch']} is not tagged yet, the plan will only be applied if it gets tagged as {last_tag['name']} before the merge")
+
+    # prefer the labels known to the pipeline, they reflect the state of the merge request when the pipeline started
+    merge_request_labels = os.environ['CI_MERGE_REQUEST_LABELS'].split(',') if os.environ.get('CI_MERGE_REQUEST_LABELS') else mr['labels']
+    # classified and folded the same way the tagging script does
+    bump_kinds = bump_ledger.classify([dict(mr, labels=merge_request_labels)])
+    next_version, = bump_ledger.fold(base_version, bump_kinds)
+    import labels
+    if labels.get_label_changes([mr]):
+        print(f"Warning: the version labels of merge request {mr_iid} don't match its 'Type of change' checkboxes")
+
+    version_plan = {
+        'mr_iid': mr['iid'],
+        'mr_title': mr['title'],
+        'target_branch': mr['target_branch'],
+        'base_commit': base_commit,
+        'source_commit': mr['sha'],
+        'base_tag': last_tag['name'] if last_tag else None,
+        'bump': bump_ledger.BUMP_NAMES[bump_kinds[0]],
+        'next_tag': f"{constants.PREFIX}{next_version}",
+    }
+    print(f"version_plan: {json.dumps(version_plan, indent=2)}")
+    return version_plan
+
+
+def load_version_plan(project_id, mr_iid, plan_file):
+
+    """
+
+    The function loads the version plan from the local artifact, or otherwise downloads it from the plan job of the merge request pipeline
+
+    :param project_id: gitlab project id
+    :param mr_iid: merge request iid
+    :param plan_file: path of the local version plan
+    :return: version plan or None if it could not be found
+    :rtype: dict or None
+
+    """
+
+    if os.path.exists(plan_file):
+        with open(plan_file) as fp:
+            return json.load(fp)
+
+    endpoint = f"{constants.BASE_ENDPOINT}/projects/{project_id}/jobs/artifacts/refs%2Fmerge-requests%2F{mr_iid}%2Fhead/raw/{constants.VERSION_PLAN_FILE}"
+    print(f"Downloading the version plan of merge request {mr_iid}, endpoint is: {endpoint}")
+    response = gitlab_scheduler.get(endpoint, priority=constants.PRIORITY_TAGGING, headers=api_backend.get_headers(), params={'job': constants.VERSION_PLAN_JOB})
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+
+def validate_version_plan(version_plan, head_commit, mr):
+
+    """
+
+    The function checks that the merge commit is the one the plan was made for
+
+    :param version_plan: version plan
+    :param head_commit: commit to be tagged, as returned by the commits api
+    :param mr: merge request of the commit
+    :return: reason why the plan doesn't apply, None if it does
+    :rtype: str or None
+
+    """
+
+    if mr['iid'] != version_plan['mr_iid']:
+        return f"the commit belongs to merge request {mr['iid']} whereas the plan was made for {version_plan['mr_iid']}"
+    if bump_ledger.BUMP_NAMES[bump_ledger.classify([mr])[0]] != version_plan['bump']:
+        return f"the labels of merge request {mr['iid']} changed since the plan was made"
+    # fast-forward merges put all the merge request commits on the first-parent history, which only the full computation handles
+    if head_commit['parent_ids'][:1] != [version_plan['base_commit']]:
+        return f"{version_plan['target_branch']} moved since the plan was made, the first parent of the commit is not {version_plan['base_commit']}"
+    # the merge is the only untagged commit only if the last tag points at the first parent
+    last_tag = api_backend.get_last_tag(os.environ['CI_PROJECT_ID'], head_commit['id'])
+    if last_tag is None:
+        if version_plan['base_tag'] is not None:
+            return f"no tag is reachable from the commit whereas the plan was made from {version_plan['base_tag']}"
+    elif last_tag['name'] != version_plan['base_tag']:
+        return f"the last tag is {last_tag['name']} whereas the plan was made from {version_plan['base_tag']}"
+    elif last_tag['commit']['id'] != version_plan['base_commit']:
+        return f"the last tag {last_tag['name']} doesn't point at the first parent {version_plan['base_commit']} of the commit"
+
+
+def apply_version_plan(project_id, head_sha, plan_file):
+
+    """
+
+    The function tags the merge commit with the planned tag once the plan is validated, saving its bump ledger in bump_ledger.json,
+    otherwise it falls back to the full tag computation
+
+    :param project_id: gitlab project id
+    :param head_sha: merge commit to be tagged
+    :param plan_file: path of the local version plan
+    :return: 0 on success
+    :rtype: int
+
+    """
+
+    import test as semver_tag
+
+    try:
+        commit_mrs = gitlab_scheduler.get_json(f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/commits/{head_sha}/merge_requests", priority=constants.PRIORITY_TAGGING, headers=api_backend.get_headers())
+        head_commit = gitlab_scheduler.get_json(f"{constants.BASE_ENDPOINT}/projects/{project_id}/repository/commits/{head_sha}", priority=constants.PRIORITY_TAGGING, headers=api_backend.get_headers())
+        mrs = [mr for mr in commit_mrs if mr['target_branch'] == os.environ.get('CI_COMMIT_BRANCH', mr['target_branch'])]
+        version_plan = load_version_plan(project_id, mrs[0]['iid'], plan_file) if mrs else None
+
+        if version_plan is None:
+            reason = 'no version plan was found for the commit'
+        else:
+            reason = validate_version_plan(version_plan, head_commit, mrs[0])
+
+        if reason is None:
+            print(f"Applying the version plan, tagging {head_sha} as {version_plan['next_tag']}")
+            # the merge commit being the only untagged commit, the ledger (and the tag message) has a single entry, like the full computation would make
+            base_version = version_plan['base_tag'][len(constants.PREFIX):] if version_plan['base_tag'] else '0.0.0'
+            ledger = bump_ledger.build_ledger(base_version, [head_commit['id']], lambda commit_sha: mrs[0])
+            bump_ledger.save_ledger(ledger)
+            tag_commit_response = semver_tag.tag_commit_optimistically(version_plan['next_tag'], head_sha, bump_ledger.get_tag_message(ledger))
+            print(f'Tag commit response is: {tag_commit_response}')
+            return 0
+        print(f"Falling back to the full tag computation as {reason}")
+    except:
+        print('Oops !! An unhandled exception occured while applying the version plan, falling back to the full tag computation')
+        traceback.print_exc()
+    return semver_tag.main()
+
+
+def main(argv=None):
+
+    """
+
+    plan: run in the merge request pipeline, saves the predicted tag of the merge in version_plan.json (to be kept as an artifact)
+    apply: run in the pipeline of the merge commit, validates the plan and applies it, or falls back to the full tag computation
+
+    """
+
+    parser = argparse.ArgumentParser(description='Plan the semver tag in the merge request pipeline and apply it after the merge')
+    parser.add_argument('mode', choices=['plan', 'apply'])
+    parser.add_argument('--plan-file', default=constants.VERSION_PLAN_FILE)
+    args = parser.parse_args(argv)
+
+    project_id = os.environ['CI_PROJECT_ID']
+    if args.mode == 'plan':
+        version_plan = create_version_plan(project_id, os.environ['CI_MERGE_REQUEST_IID'])
+        with open(args.plan_file, 'w') as fp:
+            json.dump(version_plan, fp, indent=2)
+        return 0
+    return apply_version_plan(project_id, os.environ['CI_COMMIT_SHA'], args.plan_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
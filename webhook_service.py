@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+import argparse
+import base64
+import hmac
+import json
+import os
+import subprocess
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import api_backend
+import constants
+import test as semver_tag
+
+
+class TagService():
+
+    """
+
+    The service keeps a warm bare mirror per project, the pooled http session and the request cache of the scheduler in memory,
+    and debounces bursts of merges so that every branch gets a single tag computation per burst
+
+    """
+
+    def __init__(self, mirror_root, branches, debounce_seconds, dry_run=False):
+        self.mirror_root = os.path.abspath(mirror_root)
+        self.branches = branches
+        self.debounce_seconds = debounce_seconds
+        self.dry_run = dry_run
+        self.timers = {}
+        self.timers_lock = threading.Lock()
+        self.tag_lock = threading.Lock()
+
+    def handle_event(self, event):
+
+        """
+
+        The function schedules the tagging of the target branch of a merged merge request, restarting the debounce timer if one is already pending for the branch
+
+        :param event: merge request webhook payload
+        :return: outcome of the event handling
+        :rtype: str
+
+        """
+
+        if event.get('object_kind') != 'merge_request':
+            return 'ignored: not a merge request event'
+        attributes = event.get('object_attributes', {})
+        if attributes.get('action') != 'merge':
+            return 'ignored: merge request was not merged'
+        branch = attributes.get('target_branch')
+        if branch not in self.branches:
+            return f"ignored: target branch {branch} is not tagged"
+
+        # the project id ends up in the path of the mirror, hence anything but an integer is rejected
+        project_id = event['project']['id']
+        if not str(project_id).isdigit():
+            raise ValueError(f"invalid project id: {project_id!r}")
+        key = (str(int(project_id)), branch)
+        with self.timers_lock:
+            timer = self.timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            timer = threading.Timer(self.debounce_seconds, self.run_tagging, args=(key,))
+            timer.daemon = True
+            self.timers[key] = timer
+            timer.start()
+        return f"scheduled: tagging of {branch} for project {key[0]} in {self.debounce_seconds}s"
+
+    def flush(self):
+
+        """
+
+        The function runs all the pending tag computations right away instead of waiting for their debounce timers
+
+        :return: bump tag info of every computation
+        :rtype: list
+
+        """
+
+        with self.timers_lock:
+            pending = list(self.timers.values())
+            self.timers.clear()
+        results = []
+        for timer in pending:
+            timer.cancel()
+            results.append(self.run_tagging(*timer.args))
+        return results
+
+    def run_tagging(self, key):
+
+        """
+
+        The function refreshes the mirror of the project and computes (and unless running dry, pushes) the next semver tag of the branch
+
+        The repository url comes from the gitlab api rather than from the event, so that an event can't point the service (and its token) at another host
+
+        :param key: project id and branch
+        :return: Returns the commit SHA, bump tag version and bump tag message or None if bumping is not required
+        :rtype: tuple or None
+
+        """
+
+        project_id, branch = key
+        with self.timers_lock:
+            if self.timers.get(key) is threading.current_thread():
+                del self.timers[key]
+
+        # the tagging script reads the project from the environment, hence the computations are serialised
+        with self.tag_lock:
+            try:
+                repo_url = get_repo_url(project_id)
+                mirror = self.update_mirror(project_id, branch, repo_url)
+                # the tip of the merged branch, rather than whatever commit the environment of the service refers to
+                head_sha = semver_tag.git("rev-parse", f"refs/heads/{branch}", repo_dir=mirror).decode().strip()
+                # one ledger per branch next to the mirrors, the mirrors being bare repositories
+                ledger_path = os.path.join(self.mirror_root, f"{project_id}-{branch.replace('/', '-')}-{constants.BUMP_LEDGER_FILE}")
+                os.environ['CI_PROJECT_ID'] = project_id
+                bump_tag = semver_tag.compute_bump_tag(head_sha, mirror, ledger_path)
+
+                if bump_tag:
+                    commit_sha, bump_tag_version, bump_tag_message = bump_tag
+                    if self.dry_run:
+                        print(f"Dry run, skipping the push of tag {bump_tag_version} for commit {commit_sha}")
+                    else:
+                        tag_commit_response = semver_tag.tag_commit_optimistically(bump_tag_version, commit_sha, bump_tag_message, ledger_path=ledger_path)
+                        print(f'Tag commit response is: {tag_commit_response}')
+                print(f'Request cache stats: {semver_tag.gitlab_scheduler.request_cache.stats()}')
+                return bump_tag
+            except subprocess.CalledProcessError:
+                print(f"Oops !! A git error occurred while tagging the branch {branch} of project {project_id}")
+                traceback.print_exc()
+            except:
+                print(f"Oops !! An unhandled exception occured while tagging the branch {branch} of project {project_id}")
+                traceback.print_exc()
+
+    def update_mirror(self, project_id, branch, repo_url):
+
+        """
+
+        The function creates the bare mirror of a project on first use and fetches it incrementally afterwards
+
+        Only the branch to be tagged and the tags are fetched, leaving out the other branches and the merge request refs (refs/merge-requests/*)
+        The credentials are passed to every fetch rather than stored in the url of the mirror, so that they can be rotated
+
+        :param project_id: gitlab project id
+        :param branch: branch to be tagged
+        :param repo_url: http url (or local path) of the project's repository
+        :return: path of the mirror
+        :rtype: str
+
+        """
+
+        mirror = os.path.join(self.mirror_root, project_id)
+        if not os.path.isdir(mirror):
+            os.makedirs(self.mirror_root, exist_ok=True)
+            print(f"Creating the mirror of project {project_id} in {mirror}")
+            semver_tag.git("init", "--quiet", "--bare", mirror)
+            semver_tag.git("remote", "add", "origin", repo_url, repo_dir=mirror)
+        else:
+            # also drops the credentials that mirrors cloned by earlier versions of the service kept in their url
+            semver_tag.git("remote", "set-url", "origin", repo_url, repo_dir=mirror)
+        # the refspecs given on the command line take precedence over the fetch refspecs of the remote (--refmap= keeps them from adding remote-tracking refs),
+        # including the +refs/*:refs/* of mirrors cloned by earlier versions of the service
+        semver_tag.git(*get_auth_config(repo_url), "fetch", "--prune", "--refmap=", "origin", f"+refs/heads/{branch}:refs/heads/{branch}", "+refs/tags/*:refs/tags/*", repo_dir=mirror)
+        return mirror
+
+
+def get_repo_url(project_id):
+
+    """
+
+    The function gets the http url of a project's repository through gitlab's projects api
+
+    :param project_id: gitlab project id
+    :return: http url (or, with a local api stand-in, path) of the repository
+    :rtype: str
+
+    """
+
+    project = semver_tag.gitlab_scheduler.get_json(f"{constants.BASE_ENDPOINT}/projects/{project_id}", priority=constants.PRIORITY_TAGGING, headers=api_backend.get_headers())
+    return project['http_url_to_repo']
+
+
+def get_auth_config(repo_url):
+
+    """
+
+    The function returns the git options authenticating a single command with the private token,
+    only for https repositories hosted by the gitlab instance of the api (BASE_ENDPOINT), none otherwise
+
+    :param repo_url: http url (or local path) of the repository
+    :return: git options to be put before the command
+    :rtype: list
+
+    """
+
+    token = os.environ.get(constants.CI_PRIVATE_TOKEN)
+    url = urlsplit(repo_url)
+    if url.scheme != 'https' or url.hostname != urlsplit(constants.BASE_ENDPOINT).hostname or not token:
+        return []
+    credentials = base64.b64encode(f"oauth2:{token}".encode()).decode()
+    return ["-c", f"http.extraHeader=Authorization: Basic {credentials}"]
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+
+    service = None
+
+    def do_POST(self):
+        secret = os.environ.get('WEBHOOK_SECRET', '')
+        if not secret or not hmac.compare_digest(self.headers.get('X-Gitlab-Token', '').encode(), secret.encode()):
+            self.respond(401, 'invalid webhook token')
+            return
+        try:
+            event = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            self.respond(202, self.service.handle_event(event))
+        except (ValueError, KeyError, TypeError):
+            self.respond(400, 'invalid merge request event')
+
+    def respond(self, status, message):
+        body = json.dumps({'status': message}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main():
+
+    """
+
+    The function either serves the merge request webhook events over http, or with --simulate, feeds the given payload files to the service
+    and runs the resulting tag computations right away, e.g.:
+        python webhook_service.py --simulate webhook_payload_example.json --dry-run
+
+    """
+
+    parser = argparse.ArgumentParser(description='Tag merged branches from GitLab merge request webhook events')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('WEBHOOK_PORT', constants.WEBHOOK_PORT)))
+    parser.add_argument('--mirror-root', default=os.environ.get('WEBHOOK_MIRROR_ROOT', constants.WEBHOOK_MIRROR_ROOT))
+    parser.add_argument('--branches', default=os.environ.get('WEBHOOK_BRANCHES', constants.WEBHOOK_BRANCHES), help='comma separated branches to be tagged')
+    parser.add_argument('--debounce', type=float, default=float(os.environ.get('WEBHOOK_DEBOUNCE_SECONDS', constants.WEBHOOK_DEBOUNCE_SECONDS)))
+    parser.add_argument('--dry-run', action='store_true', help='compute the tags without pushing them')
+    parser.add_argument('--simulate', nargs='+', metavar='PAYLOAD', help='webhook payload json files to be processed instead of serving')
+    args = parser.parse_args()
+
+    service = TagService(args.mirror_root, args.branches.split(','), args.debounce, args.dry_run)
+
+    if args.simulate:
+        for payload in args.simulate:
+            with open(payload) as fp:
+                print(f"{payload}: {service.handle_event(json.load(fp))}")
+        for bump_tag in service.flush():
+            print(f"bump_tag: {bump_tag}")
+        return 0
+
+    if not os.environ.get('WEBHOOK_SECRET'):
+        print('Refusing to serve the webhook events without authentication, set WEBHOOK_SECRET to the secret token of the gitlab webhook')
+        return 1
+
+    WebhookHandler.service = service
+    server = ThreadingHTTPServer(('', args.port), WebhookHandler)
+    print(f"Listening for merge request webhook events on port {args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())